@@ -1,26 +1,122 @@
 import aiohttp
 import asyncio
 import json
+import logging
+import time
+
+import metrics
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
+
+
+def dumps(obj):
+    """Сериализует запрос в байты: orjson, если установлен, иначе json."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+def loads(data):
+    """Разбирает ответ прямо из байтов, без промежуточной строки."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
 
 
 class Api:
     url_test = "http://games-test.datsteam.dev/play/snake3d/player/move"
     url = "http://games.datsteam.dev/play/snake3d/player/move"
+    mock_file = "example_response.json"
+    # разобранный ответ для режима заглушки: файл читается один раз на процесс
+    mock_response = None
 
-    def __init__(self, token, debug=False, mock=False):
+    def __init__(self, token, debug=False, mock=False, keepalive_timeout=60, recorder=None, url=None):
         self.debug = debug
         self.mock = mock
-        self.session = aiohttp.ClientSession(headers={"X-Auth-Token": token, "Content-Type": "application/json"})
+        # свой адрес хода, например локального сервера local_server.py; None — игровой сервер
+        self.url = url
+        # Recorder: если задан, каждый ход с ответом пишется в лог для повторного проигрывания
+        self.recorder = recorder
+        # сглаженное время запроса хода, мс
+        self.rtt_ms = 0
+        # сглаженное отклонение времени запроса от rtt_ms, мс
+        self.rtt_jitter_ms = 0
+        # одно соединение с сервером держим открытым между ходами
+        connector = aiohttp.TCPConnector(limit=4, keepalive_timeout=keepalive_timeout, ttl_dns_cache=None)
+        self.session = aiohttp.ClientSession(
+            connector=connector, headers={"X-Auth-Token": token, "Content-Type": "application/json"}
+        )
+
+    def move_url(self):
+        if self.url is not None:
+            return self.url
+        return Api.url_test if self.debug else Api.url
+
+    async def warmup(self):
+        """Открывает соединение заранее, чтобы первый ход не ждал DNS и TCP."""
+        if self.mock:
+            Api.load_mock()
+            return
+        try:
+            async with self.session.head(self.move_url(), timeout=aiohttp.ClientTimeout(total=5)) as resp:
+                await resp.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            log.warning("warmup failed: %r", e)
+
+    @staticmethod
+    def load_mock():
+        if Api.mock_response is None:
+            with open(Api.mock_file, "rb") as file:
+                Api.mock_response = loads(file.read())
+        return Api.mock_response
 
-    async def move(self, req):
+    async def move(self, req, timeout_ms=None):
+        """
+        Отправляет ход. timeout_ms — сколько ждать ответ; опоздавший ответ уже не нужен,
+        поэтому по таймауту возвращается None, как и при ошибке.
+        """
         if self.mock:
-            return json.load(open('example_response.json', 'r'))
-        async with self.session.post(url=Api.url_test if self.debug else Api.url, data=json.dumps(req)) as resp:
-            if resp.status != 200:
-                print(f"ERR {str(resp.status)}: {await resp.text()}")
-                return None
-            return json.loads(await resp.text())
+            return Api.load_mock()
+        timeout = aiohttp.ClientTimeout(total=timeout_ms / 1000) if timeout_ms else self.session.timeout
+        data = dumps(req)
+        sent_at = time.time()
+        start = time.perf_counter()
+        try:
+            async with self.session.post(url=self.move_url(), data=data, timeout=timeout) as resp:
+                if resp.status != 200:
+                    metrics.count("request_errors")
+                    log.warning("ERR %s: %s", resp.status, await resp.text())
+                    return None
+                body = await resp.read()
+        except asyncio.TimeoutError:
+            metrics.count("request_timeouts")
+            log.warning("ERR timeout after %sms", timeout_ms and round(timeout_ms))
+            return None
+        except aiohttp.ClientError as e:
+            metrics.count("request_errors")
+            log.warning("ERR %r", e)
+            return None
+        rtt_ms = (time.perf_counter() - start) * 1000
+        self.update_rtt(rtt_ms)
+        metrics.observe("rtt", rtt_ms)
+        if self.recorder is not None:
+            self.recorder.record(sent_at, rtt_ms, data, body)
+        return loads(body)
 
+    def update_rtt(self, rtt_ms):
+        """Экспоненциальное сглаживание времени запроса и его разброса (как RTTVAR в TCP)."""
+        if self.rtt_ms == 0:
+            self.rtt_ms = rtt_ms
+            return
+        self.rtt_jitter_ms = 0.75 * self.rtt_jitter_ms + 0.25 * abs(rtt_ms - self.rtt_ms)
+        self.rtt_ms = 0.8 * self.rtt_ms + 0.2 * rtt_ms
 
     async def close(self):
-        await self.session.close()
\ No newline at end of file
+        await self.session.close()
+        if self.recorder is not None:
+            self.recorder.close()
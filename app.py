@@ -1,170 +1,189 @@
 import asyncio
-import operator
-import threading
+import logging
 import time
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import datetime
-
-from new_visualizer import SnakeGame3D
-from vpython import rate
 
+import metrics
 from api import Api
 from cubes import Cubes
+from map_cache import MapCache
+from plan_cache import PlanCache
+from planner_pool import PlannerPool
+from recorder import Recorder
+from scheduler import TickScheduler
+from state import GameState
+from visualizer_process import VisualizerProcess
+from world import DANGER_HORIZON
+from world_diff import WorldTracker
+
+log = logging.getLogger(__name__)
 
 
 class App:
-    def __init__(self, token: str, debug: bool, mock: bool):
+    def __init__(self, token: str, debug: bool, mock: bool, workers: int = 0, plan_margin_ms: int = 50,
+                 record_path: str = None, url: str = None, metrics_port: int = None, trace_path: str = None,
+                 visualize: bool = True, danger_horizon: int = DANGER_HORIZON, team_planning: bool = True,
+                 plan_cache: bool = True, map_cache_dir: str = None):
         self.debug = debug
-        self.api = Api(token, debug, mock)
+        # record_path — файл, в который пишутся все ходы для replay.py
+        recorder = Recorder(record_path) if record_path else None
+        # url — адрес хода вместо игрового сервера (local_server.py)
+        self.api = Api(token, debug, mock, recorder=recorder, url=url)
         self.running = True
+        # map_cache_dir — каталог, где между запусками хранится граф блоков карты (map_cache.py)
+        self.map_cache = MapCache(map_cache_dir) if map_cache_dir else None
+        self.map_cache_fences = None  # заборы, для которых кеш уже проверен
+        # danger_horizon — на сколько тиков вперёд учитывать, куда могут дойти головы врагов
+        self.tracker = WorldTracker(danger_horizon, self.map_cache)
+        # workers > 0 — планировать змей параллельно в пуле процессов
+        self.pool = PlannerPool(workers, map_cache_dir) if workers > 0 else None
+        # запас до отправки хода, к которому планировщик должен вернуть ходы
+        self.plan_margin_ms = plan_margin_ms
+        self.scheduler = TickScheduler(self.api)
+        # metrics_port — порт GET /metrics; trace_path — файл JSONL с этапами каждого тика
+        self.metrics_port = metrics_port
+        self.metrics_runner = None
+        if trace_path:
+            metrics.open_trace(trace_path)
+        # visualize=False — без окна визуализации, vpython не импортируется вовсе
+        self.visualize = visualize
+        self.visualizer = None
+        # team_planning — сначала все змеи планируются по одному общему полю еды с разными целями
+        self.team_planning = team_planning
+        # plan_cache — змея идёт по пути с прошлого тика, пока он свободен и цель на месте
+        self.plans = PlanCache() if plan_cache else None
+        # id змеи -> {цель: промежуточный вход} поиска через граф блоков (Cubes.find_next_direction_to_center)
+        self.waypoints = {}
 
     async def run(self):
         """
         Асинхронное управление игрой с оптимизацией обновлений.
+        Ход N+1 планируется сразу после разбора ответа на ход N, а отправляется по таймеру
+        к границе тика с учётом задержки сети.
         """
-        # Получаем начальное состояние игры
-        # Получаем текущее время
-        current_time = time.time() * 1000
-        game_state = await self.api.move(self.make_request())
-        while game_state is None:
-            await asyncio.sleep(0.5)
-            print("retrying...")
-            game_state = await self.api.move(self.make_request())
-        self.new_tick_time = game_state["tickRemainMs"] + current_time
-        self.snake_game = SnakeGame3D(game_state)  # Инициализация визуализации
-
-        # Создаем новый event loop для asyncio
-        self.loop = asyncio.new_event_loop()
-
-        # Запускаем asyncio loop в отдельном потоке
-        self.thread = threading.Thread(target=self.start_async_loop_in_thread)
-        self.thread.start()
+        if self.metrics_port:
+            self.metrics_runner = await metrics.serve(self.metrics_port)
+        # Соединение открываем заранее, затем получаем начальное состояние игры
+        await self.api.warmup()
+        game_state = await self.request_move(self.make_request())
+        if self.visualize:
+            # Визуализация в своём процессе: получает состояния и не мешает планированию
+            self.visualizer = VisualizerProcess()
 
-        while True:
-            print(game_state["snakes"])
-            # Извлекаем змей для нового хода
-            snakes, paths = self.process_snakes(game_state)
-            print("paths:", paths)
-            self.snake_game.paths = paths
-            # Получаем новое состояние
+        while self.running:
+            # Извлекаем змей для нового хода; планирование не блокирует event loop
+            snakes, paths = await asyncio.to_thread(self.process_snakes, game_state)
+            if self.visualizer is not None:
+                self.visualizer.update(game_state, paths)
             req = self.make_request(snakes)
+            self.prepare_map_cache()
 
-            # Если прошла новая секунда, выполняем обработку
-            print("LOOP BEFORE WHILE:", (time.time() * 1000 - current_time)/1000)
-            while not self.is_new_tick():
-                pass
-            print("LOOP AFTER WHILE:", (time.time() * 1000 - current_time)/1000)
-            game_state = await self.api.move(req)
-            print("LOOP AFTER CALL:", (time.time() * 1000 - current_time)/1000)
+            # Ждём момента отправки по таймеру, а не в цикле
+            log.debug("ms to send: %.0f", self.scheduler.time_to_send_ms())
+            with metrics.span("wait_send"):
+                await self.scheduler.wait_send_time()
+            # Получаем новое состояние
+            game_state = await self.request_move(req)
+
+    async def request_move(self, req):
+        """
+        Отправляет ход и возвращает состояние нового тика (GameState), повторяя запрос при ошибках.
+        Трасса тика идёт от ответа до ответа: здесь закрывается прошлый тик и начинается новый.
+        """
+        game_state = await self.send(req)
+        while True:
             while game_state is None:
                 await asyncio.sleep(0.5)
-                print("retrying...")
-                game_state = await self.api.move(req)
-            # Получаем текущее время
-            current_time = time.time() * 1000
-            self.new_tick_time = game_state["tickRemainMs"] + current_time
-            self.snake_game.game_state = game_state
-
-    def start_async_loop_in_thread(self):
-        """Функция для запуска asyncio event loop в отдельном потоке."""
-        asyncio.set_event_loop(self.loop)
-        self.loop.run_until_complete(self.game_loop())
-
-    async def game_loop(self):
-        while self.running:
-            await self.snake_game.visualize_all_async()
-
-    def process_snakes(self, res):
+                log.warning("retrying...")
+                game_state = await self.send(req)
+            metrics.begin_tick(rtt_ms=round(self.api.rtt_ms, 1))
+            with metrics.span("parse"):
+                game_state = GameState.parse(game_state)
+            metrics.set_tick(turn=game_state.turn, tick_remain_ms=game_state.tick_remain_ms)
+            # в режиме заглушки ход не меняется никогда
+            if self.scheduler.on_response(game_state) or self.api.mock:
+                return game_state
+            # ход дошёл раньше границы тика — ждём её и спрашиваем новое состояние пустым ходом:
+            # ход этого тика сервер уже принял, повтор попал бы в следующий тик
+            log.debug("tick has not changed yet, waiting for the tick end")
+            metrics.count("early_responses")
+            await self.scheduler.wait_tick_end()
+            req = self.make_request()
+            game_state = await self.send(req)
+
+    async def send(self, req):
+        with metrics.span("request") as span:
+            res = await self.api.move(req, self.scheduler.request_timeout_ms())
+            span.set(ok=res is not None)
+        return res
+
+    def process_snakes(self, state):
         snakes = []
-        cubes = []
-        maxFoodPrice = 0
-        for fence in res["fences"]:
-            cubes.append(fence + [-100])
-        for enemy in res["enemies"]:
-            if len(enemy.get("geometry", [])) == 0:
-                continue
-            for cube in enemy["geometry"]:
-                cubes.append(cube + [-100])
-            # голова может сдвинуться в любую сторону, учитываем
-            head = enemy["geometry"][0]
-            cubes.append([head[0]-1, head[1], head[2], -75])
-            cubes.append([head[0]+1, head[1], head[2], -75])
-            cubes.append([head[0], head[1]-1, head[2], -75])
-            cubes.append([head[0], head[1]+1, head[2], -75])
-            cubes.append([head[0], head[1], head[2]-1, -75])
-            cubes.append([head[0], head[1], head[2]+1, -75])
-        for snake in res["snakes"]:
-            if len(snake.get("geometry", [])) == 0:
-                continue
-            for cube in snake["geometry"][1:]:
-                cubes.append(cube + [-100])
-        for food in res["food"]:
-            if food["points"] > maxFoodPrice:
-                maxFoodPrice = food["points"]
-            cubes.append(food["c"] + [food["points"]])
-        for golden in res["specialFood"]["golden"]:
-            cubes.append(golden + [maxFoodPrice*10])
-        for suspicious in res["specialFood"]["suspicious"]:
-            cubes.append(suspicious + [-50])
-        print(f"got {str(len(cubes))} cubes")
-        negative_cubes = set(tuple(cube[:3]) for cube in cubes if cube[3] <= 0)
+        metrics.set_tick(budget_ms=round(self.plan_budget_ms()))
+        with metrics.span("world"):
+            delta = self.tracker.update(state)
+        world = self.tracker.world
 
         paths = {}
-
-        # threads
-        # with ThreadPoolExecutor() as executor:
-        #     future_to_snake = {}
-        #
-        #     for snake in res["snakes"]:
-        #         if len(snake.get("geometry", [])) > 0:
-        #             id = snake["id"]
-        #             if self.is_new_tick():
-        #                 print("new tick! running find_safe_direction")
-        #                 future = executor.submit(Cubes.find_safe_direction,
-        #                                          snake["geometry"][0],
-        #                                          negative_cubes,
-        #                                          res["mapSize"])
-        #             else:
-        #                 future = executor.submit(Cubes.find_next_direction_to_center,
-        #                                          cubes,
-        #                                          snake["geometry"][0],
-        #                                          res["mapSize"],
-        #                                          self.is_new_tick)
-        #
-        #             future_to_snake[future] = id
-        #
-        #             # Collect results as they complete
-        #     for future in as_completed(future_to_snake):
-        #         id = future_to_snake[future]
-        #         try:
-        #             direction, path = future.result()
-        #             snakes.append({
-        #                 "id": id,
-        #                 "direction": direction
-        #             })
-        #             paths[id] = path
-        #             print(f"proceed snake {id}")
-        #         except Exception as exc:
-        #             print(f"Snake {id} generated an exception: {exc}")
-
-        for snake in res["snakes"]:
-            if len(snake.get("geometry", [])) > 0:
-                id = snake["id"]
-                if self.is_new_tick():
-                    print("new tick! running find_safe_direction")
-                    direction, path = Cubes.find_safe_direction(snake["geometry"][0], negative_cubes, res["mapSize"])
+        alive = [(snake.id, snake.head()) for snake in state.snakes if snake.is_alive()]
+        self.waypoints = {id: self.waypoints[id] for id, _ in alive if id in self.waypoints}
+
+        with metrics.span("plan", snakes=len(alive)):
+            planned = {}
+            if self.plans is not None:
+                self.plans.retain({id for id, _ in alive})
+                for id, head in alive:
+                    followed = self.plans.follow(id, head, world)
+                    if followed is not None:
+                        planned[id] = followed
+                metrics.count("plan_cache_hits", len(planned))
+            rest = [(id, head) for id, head in alive if id not in planned]
+            if self.team_planning and rest:
+                taken = self.plans.targets() if self.plans is not None else ()
+                with metrics.span("field"):
+                    planned.update(Cubes.plan_team(world, rest, self.plan_budget_ms(), taken))
+            if self.pool is not None:
+                # змеи планируются параллельно в процессах; кто не успел к сроку — идёт безопасным ходом.
+                # Изменения мира отправляются, даже если всех змей уже спланировало общее поле
+                rest = [(id, head) for id, head in alive if id not in planned]
+                planned.update(self.pool.plan(state.turn, delta, rest, time.time() * 1000 + self.plan_budget_ms()))
+
+            for i, (id, head) in enumerate(alive):
+                budget = self.plan_budget_ms()
+                if id in planned:
+                    direction, path = planned[id]
+                elif budget <= 0 or self.pool is not None:
+                    log.warning("snake %s missed the deadline! running find_safe_direction", id)
+                    metrics.count("missed_deadlines")
+                    with metrics.span("plan_snake", snake=id):
+                        direction, path = Cubes.find_safe_direction(head, world)
                 else:
-                    direction, path = Cubes.find_next_direction_to_center(cubes, snake["geometry"][0], res["mapSize"],
-                                                                          self.is_new_tick)
+                    # оставшееся время делим поровну между змеями, которых ещё не спланировали
+                    with metrics.span("plan_snake", snake=id):
+                        direction, path = Cubes.find_next_direction_to_center(
+                            world, head, budget / (len(alive) - i), waypoints=self.waypoints.setdefault(id, {})
+                        )
                 snakes.append({
-                    "id": snake["id"],
+                    "id": id,
                     "direction": direction
                 })
-                paths[snake["id"]] = path
-                print(f"proceed snake {id} {str(direction)} {str(path)}")
+                paths[id] = path
+                if self.plans is not None:
+                    self.plans.store(id, path, world)
+                log.debug("proceed snake %s %s %s", id, direction, path)
 
         return snakes, paths
 
+    def prepare_map_cache(self):
+        """
+        Когда заборы сменились (в том числе на первом ходу), запускает построение графа блоков для них
+        в отдельном процессе, если его ещё нет на диске. Ход уже спланирован, так что это не отнимает его время.
+        """
+        world = self.tracker.world
+        if self.map_cache is None or world is None or world.fences is self.map_cache_fences:
+            return
+        self.map_cache_fences = world.fences
+        self.map_cache.build_in_background(world)
+
     def make_request(self, snakes=None):
         if snakes is None:
             snakes = []
@@ -172,9 +191,18 @@ class App:
 
     async def close(self):
         await self.api.close()
+        if self.pool is not None:
+            self.pool.close()
+        if self.metrics_runner is not None:
+            await self.metrics_runner.cleanup()
+        metrics.end_tick()
+        if self.visualizer is not None:
+            self.visualizer.close()
         self.running = False
-        self.loop.stop()
-        self.thread.join()
+
+    def plan_budget_ms(self):
+        """Время на планирование: до момента отправки хода за вычетом запаса."""
+        return self.scheduler.time_to_send_ms() - self.plan_margin_ms
 
     def is_new_tick(self):
-        return time.time() * 1000 > self.new_tick_time
\ No newline at end of file
+        return self.scheduler.is_new_tick()
\ No newline at end of file
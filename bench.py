@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import subprocess
+import time
+import tracemalloc
+
+import numpy as np
+
+from api import loads
+from cubes import Cubes
+from cubes_old import find_next_direction_optimized
+from flood import flood_fill
+from hpa import hierarchical_search
+from search import a_star
+from state import GameState
+from world import DIRECTION_ARRAY, World
+
+RESULTS_DIR = "bench_results"
+
+# синтетическая карта по умолчанию — как в example_response.json; в сценариях меняется по одному параметру
+BASE = {"map_size": (180, 180, 60), "fence_density": 0.005, "food_count": 700, "snake_length": 10}
+VARIANTS = [
+    ("map_size", [(60, 60, 60), (300, 300, 100)]),
+    ("fence_density", [0.001, 0.02]),
+    ("food_count", [100, 3000]),
+    ("snake_length", [1, 100]),
+]
+
+
+def synthetic_response(map_size, fence_density, food_count, snake_length, snakes=3, enemies=175, seed=0):
+    """
+    Ответ сервера со случайной картой: заборы, еда, наши змеи и враги — случайные блуждания заданной длины.
+    Формат тот же, что у настоящего ответа, поэтому мир строится тем же кодом, что и в игре.
+    """
+    rng = np.random.default_rng(seed)
+    size = np.array(map_size)
+
+    def cells(count):
+        return (rng.random((count, 3)) * size).astype(np.int64).tolist()
+
+    def walk(length):
+        start = rng.random(3) * size
+        steps = DIRECTION_ARRAY[rng.integers(0, len(DIRECTION_ARRAY), length - 1)]
+        body = np.vstack([start, start + np.cumsum(steps, axis=0)]).astype(np.int64)
+        return np.clip(body, 0, size - 1).tolist()
+
+    return {
+        "mapSize": list(map_size),
+        "name": "bench",
+        "points": 0,
+        "turn": 1,
+        "tickRemainMs": 1000,
+        "reviveTimeoutSec": 5,
+        "errors": [],
+        "fences": cells(int(np.prod(size) * fence_density)),
+        "snakes": [
+            {"id": f"snake{i}", "direction": [1, 0, 0], "oldDirection": [1, 0, 0], "geometry": walk(snake_length),
+             "deathCount": 0, "status": "alive", "reviveRemainMs": 0}
+            for i in range(snakes)
+        ],
+        "enemies": [{"geometry": walk(2), "status": "alive", "kills": 0} for _ in range(enemies)],
+        "food": [{"c": cell, "points": int(rng.integers(1, 50)), "type": 0} for cell in cells(food_count)],
+        "specialFood": {"golden": cells(food_count // 20), "suspicious": cells(food_count // 15)},
+    }
+
+
+def scenarios():
+    """(имя, ответ сервера): пример ответа и синтетические карты."""
+    with open("example_response.json", "rb") as file:
+        yield "example", loads(file.read())
+    yield "synthetic base", synthetic_response(**BASE)
+    for name, values in VARIANTS:
+        for value in values:
+            params = dict(BASE, **{name: value})
+            yield f"synthetic {name}={value}", synthetic_response(**params)
+
+
+def old_cubes(state):
+    """Входные данные cubes_old: список [x, y, z, цена], препятствия с отрицательной ценой."""
+    cubes = [cell + [price] for cell, price in zip(state.food_coords.tolist(), state.food_points.tolist())]
+    for obstacles in (state.fences, state.enemy_segments, state.own_bodies()):
+        cubes.extend(cell + [-100] for cell in obstacles.tolist())
+    return cubes
+
+
+def measure(call, repeat):
+    """Время вызовов в мс и пиковая память одного вызова под tracemalloc (замер памяти отдельно от времени)."""
+    timings = []
+    result = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = call()
+            timings.append((time.perf_counter() - start) * 1000)
+        tracemalloc.start()
+        call()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return timings, peak, result
+
+
+def summary(timings, peak, nodes=None):
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    row = {
+        "calls": len(timings), "p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": max(timings),
+        "peak_kb": peak / 1024,
+    }
+    if nodes is not None:
+        row["nodes_per_s"] = nodes / (np.mean(timings) / 1000)
+    return row
+
+
+def farthest_food(world, head):
+    """Самая дальняя по манхэттену еда — цель для замера A* на длинном пути."""
+    food = world.food_index.items
+    if not food:
+        return None
+    return list(max(food, key=lambda cell: sum(abs(cell[i] - head[i]) for i in range(3))))
+
+
+async def bench_process_snakes(state, repeat):
+    """App.process_snakes в основном процессе, бюджет хода — как в игре."""
+    from app import App
+
+    # состояние на каждом вызове одно и то же: с кешем путей замерялось бы только следование по пути
+    app = App("", debug=False, mock=True, plan_cache=False)
+    turn = state.turn
+
+    def call():
+        # новый номер хода, чтобы каждый вызов проходил через обновление мира
+        nonlocal turn
+        turn += 1
+        state.turn = turn
+        app.scheduler.on_response(state)
+        return app.process_snakes(state)
+
+    try:
+        return measure(call, repeat)
+    finally:
+        await app.api.close()
+
+
+def bench_scenario(res, repeat):
+    state = GameState.parse(res)
+    world = World.from_state(state)
+    heads = [snake.head() for snake in state.snakes if snake.is_alive()]
+    cubes = old_cubes(state)
+    rows = {}
+
+    timings, peak, _ = measure(lambda: World.from_state(state), repeat)
+    rows["World.from_state"] = summary(timings, peak)
+
+    def each_head(function):
+        return lambda: [function(head) for head in heads]
+
+    timings, peak, _ = measure(each_head(lambda head: Cubes.find_next_direction_to_center(world, head)), repeat)
+    rows["Cubes.find_next_direction_to_center"] = summary(timings, peak)
+    timings, peak, _ = measure(each_head(lambda head: Cubes.find_safe_direction(head, world)), repeat)
+    rows["Cubes.find_safe_direction"] = summary(timings, peak)
+    timings, peak, _ = measure(
+        each_head(lambda head: find_next_direction_optimized(cubes, head, world.map_size)), repeat
+    )
+    rows["cubes_old.find_next_direction_optimized"] = summary(timings, peak)
+    timings, peak, _ = measure(
+        each_head(lambda head: find_next_direction_optimized(cubes, head, world.map_size, food_index=world.food_index)),
+        repeat,
+    )
+    rows["cubes_old.find_next_direction_optimized(food_index)"] = summary(timings, peak)
+
+    timings, peak, floods = measure(each_head(lambda head: flood_fill(world, head)), repeat)
+    rows["flood_fill"] = summary(timings, peak, sum(len(flood.parents) for flood in floods))
+    targets = [(head, farthest_food(world, head)) for head in heads]
+    timings, peak, results = measure(
+        lambda: [a_star(world, head, target, 200000) for head, target in targets if target], repeat
+    )
+    rows["a_star (farthest food)"] = summary(timings, peak, sum(result.expansions for result in results))
+    # первый повтор строит блоки графа, остальные их переиспользуют, как в игре между ходами
+    timings, peak, results = measure(
+        lambda: [hierarchical_search(world, head, target, 200000) for head, target in targets if target], repeat
+    )
+    rows["hierarchical_search (farthest food)"] = summary(
+        timings, peak, sum(result.expansions for result in results)
+    )
+
+    timings, peak, _ = asyncio.run(bench_process_snakes(state, max(1, repeat // 2)))
+    rows["App.process_snakes"] = summary(timings, peak)
+    return rows
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_rows(name, rows, baseline=None):
+    print(f"== {name}")
+    for function, row in rows.items():
+        line = (f"  {function:52} p50 {row['p50_ms']:8.2f} p95 {row['p95_ms']:8.2f} p99 {row['p99_ms']:8.2f} "
+                f"max {row['max_ms']:8.2f} ms  peak {row['peak_kb']:8.0f} KB")
+        if "nodes_per_s" in row:
+            line += f"  {row['nodes_per_s']:10.0f} nodes/s"
+        old = (baseline or {}).get(name, {}).get(function)
+        if old:
+            line += f"  p50 x{row['p50_ms'] / old['p50_ms']:.2f} vs baseline"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры горячего пути планировщика")
+    parser.add_argument("--repeat", type=int, default=10, help="вызовов на функцию")
+    parser.add_argument("--only", help="только сценарии, в имени которых есть эта строка")
+    parser.add_argument("--out", help=f"куда сохранить результаты (по умолчанию {RESULTS_DIR}/<ревизия>.json)")
+    parser.add_argument("--compare", help="файл прошлых результатов для сравнения")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)["scenarios"]
+
+    results = {}
+    for name, res in scenarios():
+        if args.only and args.only not in name:
+            continue
+        results[name] = bench_scenario(res, args.repeat)
+        print_rows(name, results[name], baseline)
+
+    rev = revision()
+    out = args.out or os.path.join(RESULTS_DIR, f"{rev}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w") as file:
+        json.dump({"revision": rev, "time": time.time(), "repeat": args.repeat, "scenarios": results}, file, indent=1)
+    print("saved", out)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,41 +1,57 @@
-import heapq
+import logging
+import time
 from math import sqrt
 
+import metrics
+from flood import flood_fill
+from food_field import plan_team
+from hpa import HPA_MIN_DISTANCE, hierarchical_search
+from search import a_star, bidirectional_search
+from world import DIRECTIONS
+
+log = logging.getLogger(__name__)
+
 
 class Cubes:
-    directions = [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
+    directions = DIRECTIONS
 
     @staticmethod
     def find_next_direction_to_center(
-        cubes, current_position, map_size, is_next_tick, search_radius=15, max_radius=64,
-        max_iterations=1000000
+        world, current_position, budget_ms=None, search_radius=15, max_radius=64,
+        max_iterations=1000000, flood_depth=64, flood_nodes=60000, probe_iterations=5000, waypoints=None
     ):
         """
         Ищет следующий шаг для движения к положительному кубу или к центру карты.
+        Сначала обходом в ширину оценивается вся еда поблизости по цене за шаг; поиск A* к дальней цели
+        запускается, только если рядом достижимой еды нет.
         В режиме centering не строится полный путь до центра: выбирается вариант, минимизирующий расстояние.
+        Путь к цели сначала ищется A* не больше чем за probe_iterations раскрытий. Если он не дошёл, поиск к далёкой
+        цели продолжается через граф блоков карты (hpa), а к близкой — встречным обходом от старта и от цели
+        (bidirectional_search).
+        budget_ms — сколько времени можно потратить на поиск; если его не хватило, возвращается первый шаг
+        частичного пути к клетке, ближе всего подошедшей к цели.
+        waypoints — {цель: промежуточный вход} прошлого поиска через граф блоков у этой змеи; обновляется на месте.
         """
-        center_position = [map_size[i] / 2 for i in range(3)]  # Центр карты
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms is not None else None
+        if waypoints:
+            # промежуточный вход к съеденной или исчезнувшей еде больше не нужен
+            for goal in [goal for goal in waypoints if world.value_flat[goal] <= 0]:
+                del waypoints[goal]
+        center_position = [world.map_size[i] / 2 for i in range(3)]  # Центр карты
 
         def find_positive_target(radius):
             """Ищет ближайший положительный куб в пределах заданного радиуса."""
-            positive_cubes = [
-                (cube[:3], cube[3])
-                for cube in cubes
-                if cube[3] > 0
-                and distance(current_position, cube[:3]) <= radius
-                and Cubes.is_within_bounds(cube[:3], map_size)
-            ]
-            positive_cubes.sort(key=lambda x: (-x[1], distance(current_position, x[0])))
-            return positive_cubes[0] if positive_cubes else None
+            found = world.food_index.within_radius(current_position, radius)
+            if not found:
+                return None
+            # самый дорогой, при равной цене — ближайший
+            position, price, _ = max(found, key=lambda item: (item[1], -item[2]))
+            return list(position), price
 
         def distance(a, b):
             """Рассчитывает евклидово расстояние (или квадратичную метрику)."""
             return sqrt(sum((a[i] - b[i]) ** 2 for i in range(3)))
 
-        def is_adjacent_to_target(position, target_position):
-            """Проверяет, находится ли позиция рядом с целевой точкой."""
-            return distance(position, target_position) <= 1
-
         def evaluate_centering():
             """
             В режиме centering:
@@ -50,10 +66,7 @@ class Cubes:
                 next_position = [current_position[i] + direction[i] for i in range(3)]
 
                 # Проверяем, чтобы следующий шаг был безопасным
-                if (
-                    tuple(next_position) in negative_cubes
-                    or not Cubes.is_within_bounds(next_position, map_size)
-                ):
+                if world.is_blocked(next_position):
                     continue
 
                 # Вычисляем расстояние до центра из новой позиции
@@ -65,12 +78,27 @@ class Cubes:
                     best_step = direction
                     path = [current_position, next_position]
 
+            if best_step is None:
+                # все соседи заняты: безопасный ход всё равно вернёт направление
+                return Cubes.find_safe_direction(current_position, world)
             return best_step, path
 
-        # Разделяем кубы на положительные и отрицательные
-        negative_cubes = set(tuple(cube[:3]) for cube in cubes if cube[3] <= 0)
+        # Один обход в ширину дает настоящие расстояния до всей достижимой еды рядом
+        flood = flood_fill(world, current_position, max_depth=flood_depth, max_nodes=flood_nodes, deadline=deadline)
+        metrics.annotate(mode="flood", expansions=len(flood.parents))
+        best = flood.best_target()
+        if best:
+            cell, steps, price = best
+            path = flood.path_to(cell)
+            log.debug("found target %s (%s) in %s steps", path[-1], price, steps)
+            return tuple(path[1][i] - path[0][i] for i in range(3)), path
+        if flood.complete:
+            # Обошли всю достижимую область, еды в ней нет — строить путь не к чему
+            log.debug("Режим centering: достижимой еды нет.")
+            metrics.annotate(mode="centering")
+            return evaluate_centering()
+
         target = find_positive_target(search_radius)
-        mode = "positive_target" if target else "centering"
 
         # Если мы ищем положительную цель
         while not target and search_radius <= max_radius:
@@ -79,81 +107,58 @@ class Cubes:
 
         if not target:
             # Если цель не найдена, переключаемся на режим 'centering'
-            print("[LOG] Режим centering: минимизация расстояния до центра.")
+            log.debug("Режим centering: минимизация расстояния до центра.")
+            metrics.annotate(mode="centering")
             return evaluate_centering()
 
-        print("[LOG] found target", target)
+        log.debug("found target %s", target)
         # Если цель найдена, мы строим путь к ней
         target_position, _ = target
-        visited = set()
-        pq = []
-        heapq.heappush(pq, (0, current_position, [], None))  # (приоритет, позиция, путь, первый шаг)
-        iteration_count = 0
-
-        best_first_step = None
-
-        while pq:
-            iteration_count += 1
-            if iteration_count > max_iterations:
-                if mode == "positive_target":
-                    # Если мы в режиме поиска цели и превышен лимит итераций, переключаемся на центр карты
-                    print("[LOG] Переключение на центр карты из positive_target после превышения итераций.")
-                    return evaluate_centering()
-
-            if is_next_tick():
-                print("[LOG] Переключение на центр карты из positive_target после начала следующего тика.")
-                return evaluate_centering()
-
-            cost, position, path, first_step = heapq.heappop(pq)
-
-            if tuple(position) in visited:
-                continue
-            visited.add(tuple(position))
-
-            # Проверяем, достигли ли мы цели (находимся вплотную)
-            if is_adjacent_to_target(position, target_position):
-                # Если соседняя клетка — это цель, выбираем прямое направление
-                for direction in Cubes.directions:
-                    next_position = [position[i] + direction[i] for i in range(3)]
-                    if next_position == target_position:
-                        return direction, path + [target_position]
-
-            # Добавляем текущую позицию в путь
-            path = path + [position]
-
-            # Если достигли цели
-            if position == list(target_position):
-                if not best_first_step:
-                    best_first_step = first_step  # Зафиксировать первый шаг
-                return best_first_step, path
-
-            # Обрабатываем каждое направление
-            for direction in Cubes.directions:
-                next_position = [position[i] + direction[i] for i in range(3)]
-
-                # Проверяем границы, статус препятствия и посещение
-                if (
-                        tuple(next_position) in visited
-                        or tuple(next_position) in negative_cubes
-                        or not Cubes.is_within_bounds(next_position, map_size)
-                ):
-                    continue
-
-                # Используем эвристику: расстояние до цели
-                heuristic_to_target = distance(next_position, target_position)
-                heapq.heappush(
-                    pq, (cost + 1 + heuristic_to_target, next_position, path, first_step or direction)
+        mode = "a_star"
+        result = a_star(world, current_position, target_position, probe_iterations, deadline=deadline)
+        if not result.found and not result.exhausted and (deadline is None or time.perf_counter() < deadline):
+            expansions = result.expansions
+            if sum(abs(target_position[i] - current_position[i]) for i in range(3)) > HPA_MIN_DISTANCE:
+                # A* не дошёл до далёкой цели: путь через граф блоков карты, настоящим A* уточняются только
+                # ближайшие блоки
+                mode = "hpa"
+                goal = world.encode(target_position)
+                waypoint = waypoints.get(goal) if waypoints is not None else None
+                result = hierarchical_search(
+                    world, current_position, target_position, max_iterations, deadline, waypoint=waypoint
                 )
+                if waypoints is not None:
+                    # у змеи одна далёкая цель: прошлые, в том числе съеденные, забываются
+                    waypoints.clear()
+                    if result.waypoint is not None:
+                        waypoints[goal] = result.waypoint
+            else:
+                # A* увяз: цель в гуще заборов или заперта. Встречный обход от цели быстро упрётся в стенки кармана,
+                # если цель заперта, а иначе найдёт путь без блужданий эвристики
+                mode = "bidirectional"
+                result = bidirectional_search(world, current_position, target_position, max_iterations, deadline)
+            result.expansions += expansions
+        metrics.annotate(mode=mode, expansions=len(flood.parents) + result.expansions)
+        if result.found:
+            return result.first_step(), result.path
+        if not result.exhausted and result.first_step():
+            # Не хватило времени или итераций: идём к клетке, ближе всего подошедшей к цели.
+            # Для hpa это обычный случай: путь уточнён до входа в блок на пути к цели
+            log.debug("Частичный путь из positive_target после %s раскрытий.", result.expansions)
+            if mode != "hpa":
+                metrics.annotate(mode="partial")
+            return result.first_step(), result.path
 
         # Если не нашли путь, возвращаем безопасное направление
-        return Cubes.find_safe_direction(current_position, negative_cubes, map_size)
+        return Cubes.find_safe_direction(current_position, world)
 
     @staticmethod
-    def find_safe_direction(current_position, negative_cubes, map_size):
+    def find_safe_direction(current_position, world):
         """Находит безопасное направление для движения."""
+        metrics.annotate(mode="safe")
         for direction in Cubes.directions:
             next_position = [current_position[i] + direction[i] for i in range(3)]
-            if tuple(next_position) not in negative_cubes and Cubes.is_within_bounds(next_position, map_size):
+            if not world.is_blocked(next_position):
                 return direction, [current_position, next_position]
         return (
             (1, 0, 0),
@@ -164,6 +169,18 @@ class Cubes:
         )  # По умолчанию "идём вперёд"
 
     @staticmethod
-    def is_within_bounds(position, map_size):
-        """Проверяет, что позиция внутри границ карты."""
-        return all(0 <= position[i] <= map_size[i] for i in range(3))
\ No newline at end of file
+    def plan_team(world, snakes, budget_ms=None, taken=()):
+        """
+        Ходы сразу всех змей по общему полю еды (food_field.plan_team): у каждой змеи своя цель.
+        :param snakes: список (id, голова)
+        :param taken: клетки еды, к которым уже идут другие змеи
+        :return: {id: (направление, путь)} для змей, до которых дошло поле; остальных планируют по одной
+        """
+        deadline = time.perf_counter() + budget_ms / 1000 if budget_ms is not None else None
+        heads = {snake_id: world.encode(head) for snake_id, head in snakes}
+        planned = {}
+        for snake_id, (_, path, _) in plan_team(world, heads, deadline=deadline, taken=taken).items():
+            path = [world.decode(cell) for cell in path]
+            planned[snake_id] = tuple(path[1][i] - path[0][i] for i in range(3)), path
+        metrics.annotate(planned=len(planned))
+        return planned
@@ -2,22 +2,29 @@ import heapq
 from math import sqrt
 
 
-def find_next_direction_optimized(cubes, current_position, map_size, search_radius=15, max_radius=64, max_iterations=10000):
+def find_next_direction_optimized(cubes, current_position, map_size, search_radius=15, max_radius=64, max_iterations=10000,
+                                  food_index=None):
     """
     Оптимизированная функция для выбора направления движения, основанная на A* с приоритетом дорогих кубов.
     :param cubes: Список кубов, каждый элемент - [x, y, z, price]
     :param current_position: Текущая позиция нашего куба [x, y, z]
     :param search_radius: Радиус для учета ближайших кубов (ускоряет поиск)
+    :param food_index: SpatialIndex положительных кубов; если передан, кубы в радиусе берутся из него без обхода списка
     :return: Вектор направления движения [dx, dy, dz]
     """
     directions = [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
 
     # Разделяем кубы на положительные и отрицательные
-    positive_cubes = [
-        (cube[:3], cube[3])
-        for cube in cubes
-        if cube[3] > 0 and distance(current_position, cube[:3]) <= search_radius
-    ]
+    if food_index is not None:
+        positive_cubes = [
+            (list(cell), price) for cell, price, _ in food_index.within_radius(current_position, search_radius)
+        ]
+    else:
+        positive_cubes = [
+            (cube[:3], cube[3])
+            for cube in cubes
+            if cube[3] > 0 and distance(current_position, cube[:3]) <= search_radius
+        ]
     negative_cubes = set(tuple(cube[:3]) for cube in cubes if cube[3] <= 0)
 
     # Сортируем положительные кубы на основе "цена / расстояние"
@@ -0,0 +1,63 @@
+import time
+
+from search import reconstruct
+
+
+class FloodResult:
+    """Результат обхода в ширину от головы змеи."""
+
+    def __init__(self, world, start, parents, targets, complete):
+        self.world = world
+        self.start = start
+        self.parents = parents  # клетка -> клетка, из которой в неё пришли (плоские индексы)
+        self.targets = targets  # (клетка, число шагов, цена) для всей достижимой еды
+        self.complete = complete  # обойдена вся достижимая область: дальше идти некуда
+
+    def best_target(self):
+        """Цель с наибольшей ценой за шаг; при равенстве — ближайшая."""
+        if not self.targets:
+            return None
+        return max(self.targets, key=lambda target: (target[2] / target[1], -target[1]))
+
+    def path_to(self, cell):
+        """Путь от старта до клетки в координатах, начиная со старта."""
+        return reconstruct(self.world, self.parents, cell)
+
+
+def flood_fill(world, start, max_depth=64, max_nodes=100000, deadline=None):
+    """
+    Обход в ширину по сетке препятствий от стартовой клетки.
+    За один проход дает настоящие расстояния (в шагах, с учётом препятствий) до всей еды в пределах
+    max_depth шагов. Обход прекращается после слоя, на котором посещено больше max_nodes клеток,
+    или после слоя, закончившегося позже deadline (time.perf_counter()).
+    Обход учитывает время: на шаге depth нельзя в клетку, куда голова врага может дойти за depth тиков
+    (world.reach), а клетка тела змеи — врага или нашей — проходима, если хвост уйдёт из неё раньше (world.vacate).
+    """
+    blocked = world.blocked_flat
+    reach = world.reach_flat
+    vacate = world.vacate_flat
+    value = world.value_flat
+    neighbours = world.neighbours
+    start = world.encode(start)
+    parents = {start: -1}
+    targets = []
+    frontier = [start]
+    depth = 0
+    while frontier and depth < max_depth and len(parents) <= max_nodes:
+        depth += 1
+        next_frontier = []
+        for cell in frontier:
+            for step in neighbours:
+                next_cell = cell + step
+                if next_cell in parents or reach[next_cell] <= depth:
+                    continue
+                if blocked[next_cell] and not 0 < vacate[next_cell] < depth:
+                    continue
+                parents[next_cell] = cell
+                next_frontier.append(next_cell)
+                if value[next_cell] > 0:
+                    targets.append((next_cell, depth, value[next_cell]))
+        frontier = next_frontier
+        if deadline is not None and time.perf_counter() > deadline:
+            break
+    return FloodResult(world, start, parents, targets, not frontier)
@@ -0,0 +1,191 @@
+import time
+
+import numpy as np
+
+# «ещё не достигнута»
+UNSET = np.iinfo(np.int16).max
+# дорогая еда получает фору: на шаг за каждые VALUE_PER_STEP очков, но не больше MAX_BONUS шагов
+VALUE_PER_STEP = 10
+MAX_BONUS = 32
+
+
+def padded_coords(world, cells):
+    """Координаты клеток в массиве с рамкой (на единицу больше координат карты), массивом (n, 3)."""
+    x, rest = np.divmod(cells, world.strides[0])
+    y, z = np.divmod(rest, world.strides[1])
+    return np.stack([x, y, z], axis=1)
+
+
+class FoodField:
+    """
+    Общее для всех змей поле от всей еды сразу: обход в ширину из всех клеток с едой одновременно.
+    score клетки — сколько шагов до еды с учётом форы за цену (offset + расстояние), label — номер этой еды.
+    Дорогая еда стартует раньше (меньше offset), поэтому поле ведёт к лучшей по сочетанию цены и расстояния еде,
+    а не просто к ближайшей. Ход змеи — сосед головы с наименьшим score, путь — спуск по полю.
+    """
+
+    def __init__(self, world):
+        self.world = world
+        size = world.blocked.size
+        self.score = np.full(size, UNSET, dtype=np.int16)
+        self.label = np.full(size, -1, dtype=np.int32)
+        self.score_flat = memoryview(self.score)
+        self.label_flat = memoryview(self.label)
+        self.sources = np.empty(0, dtype=np.int64)
+        self.complete = False  # поле дошло до всех голов
+
+    @staticmethod
+    def food_sources(world, excluded=()):
+        """Плоские индексы клеток с едой и их цены, кроме excluded."""
+        items = [(cell, value) for cell, value in world.food_index.items.items() if cell not in excluded]
+        if not items:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        cells = np.array([cell for cell, _ in items], dtype=np.int64)
+        values = np.array([value for _, value in items], dtype=np.int64)
+        return (cells + 1) @ world.strides, values
+
+    def compute(self, sources, values, heads, max_score=96, deadline=None):
+        """
+        Строит поле, пока у каждой головы не появится достигнутый свободный сосед,
+        до max_score или до deadline (time.perf_counter()).
+        Один шаг обхода — несколько векторных операций над фронтом, без цикла по клеткам.
+        :param heads: плоские индексы голов наших змей
+        """
+        world = self.world
+        blocked = world.blocked.reshape(-1)
+        steps = np.array(world.neighbours)
+        self.score.fill(UNSET)
+        self.label.fill(-1)
+        self.sources = sources
+        self.complete = False
+
+        offsets = MAX_BONUS - np.minimum(values // VALUE_PER_STEP, MAX_BONUS)
+        order = np.argsort(offsets, kind="stable")
+        sources, offsets = sources[order], offsets[order]
+        labels = order.astype(np.int32)
+        starts = np.searchsorted(offsets, np.arange(max_score + 2))
+
+        # свободные соседи голов: поле достаточно, когда у каждой головы достигнут хотя бы один
+        head_neighbours = (np.asarray(heads, dtype=np.int64)[:, None] + steps)
+        open_neighbours = blocked[head_neighbours] == 0
+        waiting = open_neighbours.any(axis=1)
+        head_coords = padded_coords(world, np.asarray(heads, dtype=np.int64))
+
+        # закрытые клетки: препятствия и уже достигнутые
+        closed = blocked.copy()
+        # номер записи в массиве кандидатов — для удаления повторов без сортировки
+        slot = self.label
+        frontier = np.empty(0, dtype=np.int64)
+        frontier_labels = np.empty(0, dtype=np.int32)
+        for score in range(max_score + 1):
+            # еда, чья фора заканчивается на этом шаге, и соседи прошлого фронта
+            new = slice(starts[score], starts[score + 1])
+            cells = np.concatenate([sources[new], (frontier[:, None] + steps).reshape(-1)])
+            cell_labels = np.concatenate([labels[new], np.repeat(frontier_labels, len(steps))])
+            keep = closed[cells] == 0
+            cells, cell_labels = cells[keep], cell_labels[keep]
+            # повторы: из нескольких записей одной клетки остаётся та, что записала свой номер последней
+            positions = np.arange(len(cells), dtype=np.int32)
+            slot[cells] = positions
+            first = slot[cells] == positions
+            frontier, frontier_labels = cells[first], cell_labels[first]
+            closed[frontier] = 1
+            self.score[frontier] = score
+            self.label[frontier] = frontier_labels
+
+            if waiting.any():
+                reached = ((self.score[head_neighbours] != UNSET) & open_neighbours).any(axis=1)
+                waiting &= ~reached
+            if not waiting.any():
+                self.complete = True
+                break
+            # отсечение фронта: от клетки со score до ещё не достигнутой головы не меньше манхэттенского расстояния,
+            # и если сумма больше max_score, клетка этой голове не пригодится
+            remaining = head_coords[waiting]
+            if len(frontier) and len(remaining):
+                coords = padded_coords(world, frontier)
+                distance = np.abs(coords[:, None, :] - remaining[None, :, :]).sum(axis=2).min(axis=1)
+                near = distance <= max_score - score
+                frontier, frontier_labels = frontier[near], frontier_labels[near]
+            if not len(frontier) and starts[score + 1] == len(sources):
+                break
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        return self
+
+    def best_step(self, head):
+        """
+        Градиент поля у головы: свободный сосед с наименьшим score. O(1) — шесть чтений.
+        Возвращает (клетка, score) или None, если поле до головы не дошло.
+        """
+        world = self.world
+        blocked = world.blocked_flat
+        reach = world.reach_flat
+        best = None
+        for step in world.neighbours:
+            cell = head + step
+            if blocked[cell] or reach[cell] <= 1:
+                continue
+            score = self.score_flat[cell]
+            if score != UNSET and (best is None or score < best[1]):
+                best = (cell, score)
+        return best
+
+    def descend(self, cell):
+        """Путь по полю от клетки до её еды: каждый шаг — сосед с той же меткой и score на единицу меньше."""
+        label = self.label_flat[cell]
+        target = int(self.sources[label])
+        path = [cell]
+        while cell != target:
+            score = self.score_flat[cell]
+            for step in self.world.neighbours:
+                next_cell = cell + step
+                if self.label_flat[next_cell] == label and self.score_flat[next_cell] == score - 1:
+                    cell = next_cell
+                    break
+            else:
+                break  # до еды дошли через её собственную клетку с форой: score источника равен offset
+            path.append(cell)
+        return path
+
+
+def plan_team(world, heads, max_score=96, deadline=None, taken=()):
+    """
+    Ходы всех наших змей по одному общему полю еды с раздачей разных целей.
+    Змеи по очереди от ближней к цели к дальней забирают свою еду; если еда уже занята, поле пересчитывается
+    без занятой еды — обычно хватает одного расчёта, в худшем случае по одному на змею.
+    :param heads: {id змеи: плоский индекс головы}
+    :param taken: клетки еды, которые уже заняты другими змеями
+    :return: {id змеи: (клетка первого шага, путь плоскими индексами, клетка еды)} для змей, до которых дошло поле
+    """
+    field = FoodField(world)
+    taken = set(taken)
+    plans = {}
+    waiting = dict(heads)
+    while waiting:
+        sources, values = FoodField.food_sources(world, taken)
+        if not len(sources):
+            break
+        field.compute(sources, values, list(waiting.values()), max_score, deadline)
+        steps = {}
+        for snake_id, head in waiting.items():
+            best = field.best_step(head)
+            if best is not None:
+                steps[snake_id] = best
+        if not steps:
+            break
+        progress = False
+        for snake_id, (cell, score) in sorted(steps.items(), key=lambda item: item[1][1]):
+            target = int(field.sources[field.label_flat[cell]])
+            target_cell = tuple(world.decode(target))
+            if target_cell in taken:
+                continue
+            taken.add(target_cell)
+            plans[snake_id] = (cell, [heads[snake_id]] + field.descend(cell), target)
+            del waiting[snake_id]
+            progress = True
+        if not progress or (deadline is not None and time.perf_counter() > deadline):
+            break
+        # у оставшихся змей цель совпала с чужой — пересчёт без занятой еды
+        waiting = {snake_id: head for snake_id, head in waiting.items() if snake_id in steps}
+    return plans
@@ -0,0 +1,377 @@
+import time
+from heapq import heappush, heappop
+
+import numpy as np
+
+from search import SearchResult, a_star
+
+# сторона блока карты в клетках
+CHUNK_SIZE = 16
+# на сколько блоков вперёд абстрактный путь уточняется настоящим A*
+REFINE_CHUNKS = 2
+# ближе этого (по манхэттену) цель ищется обычным A*: граф блоков на коротких путях только мешает
+HPA_MIN_DISTANCE = 2 * CHUNK_SIZE
+# вес эвристики абстрактного поиска
+HEURISTIC_WEIGHT = 2
+
+
+def chunk_distances(free, sources, targets):
+    """
+    Расстояния обхода в ширину внутри блока от каждой клетки sources до каждой клетки targets:
+    массив (len(sources), len(targets)), -1 — недостижима.
+    Обходы от всех источников идут одновременно: каждому источнику отведён бит в маске клетки,
+    шаг обхода — шесть сдвигов одного массива масок, без цикла по клеткам и по источникам.
+    :param free: маска свободных клеток блока
+    :param sources: локальные координаты клеток блока
+    :param targets: локальные координаты клеток блока
+    """
+    distance = np.full((len(sources), len(targets)), -1, dtype=np.int16)
+    if not len(targets):
+        return distance
+    targets = tuple(np.array(targets).T)
+    for first in range(0, len(sources), 64):
+        group = sources[first:first + 64]
+        bits = np.uint64(1) << np.arange(len(group), dtype=np.uint64)
+        free_bits = np.where(free, ~np.uint64(0), np.uint64(0))
+        reached = np.zeros(free.shape, dtype=np.uint64)
+        np.bitwise_or.at(reached, tuple(np.array(group).T), bits)
+        frontier = reached.copy()
+        step = 0
+        while True:
+            # у каждой цели — какие источники дошли до неё на этом шаге
+            arrived = frontier[targets]
+            for j in np.flatnonzero(arrived):
+                distance[first:first + len(group), j][(arrived[j] & bits) != 0] = step
+            step += 1
+            grown = np.zeros_like(frontier)
+            grown[1:] |= frontier[:-1]
+            grown[:-1] |= frontier[1:]
+            grown[:, 1:] |= frontier[:, :-1]
+            grown[:, :-1] |= frontier[:, 1:]
+            grown[:, :, 1:] |= frontier[:, :, :-1]
+            grown[:, :, :-1] |= frontier[:, :, 1:]
+            frontier = grown & free_bits & ~reached
+            if not frontier.any():
+                break
+            reached |= frontier
+    return distance
+
+
+def to_csr(keys, values):
+    """
+    Пары (ключ, значение) — в сжатые строки (CSR): отсортированные различные ключи, смещения их строк и значения
+    подряд. Строка ключа keys[i] — values[offsets[i]:offsets[i + 1]].
+    """
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    unique, starts = np.unique(keys, return_index=True)
+    return unique, np.append(starts, len(keys)), values
+
+
+def csr_row(keys, offsets, values, key):
+    """Строка ключа в CSR (to_csr) списком python; пустой список, если ключа нет."""
+    position = int(np.searchsorted(keys, key))
+    if position == len(keys) or keys[position] != key:
+        return []
+    return values[offsets[position]:offsets[position + 1]].tolist()
+
+
+def components(free):
+    """Связные (по сторонам) области свободных клеток двумерной маски: списки клеток (u, v)."""
+    left = set(map(tuple, np.argwhere(free).tolist()))
+    found = []
+    while left:
+        queue = [left.pop()]
+        for u, v in queue:
+            for cell in ((u + 1, v), (u - 1, v), (u, v + 1), (u, v - 1)):
+                if cell in left:
+                    left.remove(cell)
+                    queue.append(cell)
+        found.append(queue)
+    return found
+
+
+class ChunkGraph:
+    """
+    Абстрактный граф для иерархического поиска пути (HPA*) по статичным препятствиям — заборам.
+    Карта делится на блоки CHUNK_SIZE^3. На каждой общей грани соседних блоков каждая связная область
+    свободных клеток даёт вход — пару клеток по обе стороны грани, соединённых ребром длины 1.
+    Входы одного блока соединены рёбрами с расстояниями обхода в ширину внутри блока.
+    Блоки строятся лениво, когда поиск впервые в них заходит, и дальше переиспользуются между ходами;
+    поиск обращается к графу только через entrances_of, edges_of и links_of. Клетки — плоские индексы мира (с рамкой).
+    """
+
+    def __init__(self, world, static, chunk_size=CHUNK_SIZE):
+        self.world = world
+        self.chunk_size = chunk_size
+        self.static = static  # 1 — рамка или забор; массив только читается
+        self.counts = tuple(-(-size // chunk_size) for size in world.map_size)
+        self.faces = set()  # построенные грани: (блок, ось)
+        self.entrances = {}  # блок -> клетки его входов
+        self.links = {}  # клетка входа -> клетки входов по ту сторону грани
+        self.edges = {}  # блок -> {клетка входа: [(клетка входа того же блока, расстояние)]}
+
+    @staticmethod
+    def static_mask(world, fences):
+        """Маска статичных препятствий: рамка мира и заборы (плоские индексы)."""
+        static = world.border.copy()
+        static.reshape(-1)[fences] = 1
+        return static
+
+    def build_all(self):
+        """Строит все блоки карты сразу (для сохранения в map_cache заранее, а не по ходу игры)."""
+        for x in range(self.counts[0]):
+            for y in range(self.counts[1]):
+                for z in range(self.counts[2]):
+                    self.build_chunk((x, y, z))
+
+    def as_arrays(self):
+        """
+        Весь граф (недостроенные блоки достраиваются) массивами numpy для сохранения на диск (map_cache):
+        входы блоков подряд по номеру блока, рёбра и связи через грани — сжатыми строками (to_csr).
+        """
+        self.build_all()
+        entrances = [self.entrances.get(chunk, []) for chunk in np.ndindex(*self.counts)]
+        edges = np.array(
+            [(cell, other, distance) for edges in self.edges.values()
+             for cell, neighbours in edges.items() for other, distance in neighbours], dtype=np.int64
+        ).reshape(-1, 3)
+        links = np.array(
+            [(cell, other) for cell, others in self.links.items() for other in others], dtype=np.int64
+        ).reshape(-1, 2)
+        edge_cells, edge_offsets, edge_targets = to_csr(edges[:, 0], edges[:, 1:])
+        link_cells, link_offsets, link_targets = to_csr(links[:, 0], links[:, 1])
+        return {
+            "static": self.static,
+            "entrance_offsets": np.cumsum([0] + [len(cells) for cells in entrances], dtype=np.int64),
+            "entrance_cells": np.array([cell for cells in entrances for cell in cells], dtype=np.int64),
+            "edge_cells": edge_cells,
+            "edge_offsets": edge_offsets,
+            "edge_targets": edge_targets,
+            "link_cells": link_cells,
+            "link_offsets": link_offsets,
+            "link_targets": link_targets,
+        }
+
+    def coords(self, cell):
+        x, rest = divmod(cell, self.world.strides[0])
+        y, z = divmod(rest, self.world.strides[1])
+        return x, y, z
+
+    def chunk_of(self, cell):
+        size = self.chunk_size
+        return tuple((axis - 1) // size for axis in self.coords(cell))
+
+    def chunk_distance(self, cell, other):
+        """Через сколько блоков (по наибольшей из осей) лежат блоки двух клеток."""
+        return max(abs(a - b) for a, b in zip(self.chunk_of(cell), self.chunk_of(other)))
+
+    def bounds(self, chunk):
+        """Границы блока в координатах массива с рамкой: [low, high)."""
+        low = tuple(index * self.chunk_size + 1 for index in chunk)
+        high = tuple(min((index + 1) * self.chunk_size, size) + 1 for index, size in zip(chunk, self.world.map_size))
+        return low, high
+
+    def build_face(self, chunk, axis):
+        """Входы на грани между блоком и следующим за ним по оси axis."""
+        if (chunk, axis) in self.faces or chunk[axis] + 1 >= self.counts[axis]:
+            return
+        self.faces.add((chunk, axis))
+        neighbour = tuple(index + (i == axis) for i, index in enumerate(chunk))
+        low, high = self.bounds(chunk)
+        inner = [slice(low[i], high[i]) for i in range(3)]
+        inner[axis] = high[axis] - 1
+        outer = list(inner)
+        outer[axis] = high[axis]
+        free = (self.static[tuple(inner)] == 0) & (self.static[tuple(outer)] == 0)
+        plane = [i for i in range(3) if i != axis]
+        stride = self.world.strides[axis]
+        for component in components(free):
+            # вход — клетка области, ближайшая к её середине
+            middle = np.mean(component, axis=0)
+            u, v = min(component, key=lambda cell: abs(cell[0] - middle[0]) + abs(cell[1] - middle[1]))
+            position = [0, 0, 0]
+            position[axis] = high[axis] - 1
+            position[plane[0]] = low[plane[0]] + u
+            position[plane[1]] = low[plane[1]] + v
+            cell = int(np.dot(position, self.world.strides))
+            self.entrances.setdefault(chunk, []).append(cell)
+            self.entrances.setdefault(neighbour, []).append(cell + stride)
+            self.links.setdefault(cell, []).append(cell + stride)
+            self.links.setdefault(cell + stride, []).append(cell)
+
+    def build_chunk(self, chunk):
+        """Входы на всех гранях блока и расстояния между ними внутри блока."""
+        if chunk in self.edges:
+            return self.edges[chunk]
+        for axis in range(3):
+            self.build_face(chunk, axis)
+            if chunk[axis] > 0:
+                self.build_face(tuple(index - (i == axis) for i, index in enumerate(chunk)), axis)
+        cells = self.entrances.get(chunk, [])
+        edges = {cell: [] for cell in cells}
+        if cells:
+            distance = self.distances_from(chunk, cells, cells)
+            for i, cell in enumerate(cells):
+                for j, other in enumerate(cells):
+                    if i != j and distance[i][j] >= 0:
+                        edges[cell].append((other, int(distance[i][j])))
+        self.edges[chunk] = edges
+        return edges
+
+    def entrances_of(self, chunk):
+        """Клетки входов блока; блок строится, если ещё не построен."""
+        self.build_chunk(chunk)
+        return self.entrances.get(chunk, [])
+
+    def edges_of(self, cell):
+        """Рёбра от входа к другим входам его блока: [(вход, расстояние)]."""
+        return self.build_chunk(self.chunk_of(cell)).get(cell, [])
+
+    def links_of(self, cell):
+        """Входы по ту сторону грани, с которыми связан вход."""
+        self.build_chunk(self.chunk_of(cell))
+        return self.links.get(cell, [])
+
+    def distances_from(self, chunk, sources, targets):
+        """
+        Расстояния внутри блока от клеток sources до клеток targets: массив (len(sources), len(targets)),
+        -1 — клетка недостижима.
+        """
+        low, high = self.bounds(chunk)
+        free = self.static[low[0]:high[0], low[1]:high[1], low[2]:high[2]] == 0
+
+        def local(cells):
+            return [tuple(axis - low[i] for i, axis in enumerate(self.coords(cell))) for cell in cells]
+
+        return chunk_distances(free, local(sources), local(targets))
+
+    def endpoint_edges(self, cell):
+        """Рёбра от клетки (старт или цель поиска) до входов её блока: {вход: расстояние}."""
+        chunk = self.chunk_of(cell)
+        entrances = self.entrances_of(chunk)
+        distance = self.distances_from(chunk, [cell], entrances)[0]
+        return {entrance: int(d) for entrance, d in zip(entrances, distance) if d >= 0}
+
+    def abstract_path(self, source, goal, deadline=None, weight=HEURISTIC_WEIGHT):
+        """
+        Взвешенный A* по графу входов от source до goal (плоские индексы): эвристика умножается на weight.
+        Путь через середины граней заметно длиннее манхэттенского расстояния, и с точной эвристикой поиск
+        раскрывал бы (и строил) половину карты; путь со взвешенной эвристикой длиннее лучшего не больше
+        чем в weight раз, а уточняется всё равно настоящим A*.
+        :return: (клетки абстрактного пути от source до goal или None, число раскрытий, недостижима ли цель)
+        """
+        start_edges = self.endpoint_edges(source)
+        goal_edges = self.endpoint_edges(goal)
+        gx, gy, gz = self.coords(goal)
+
+        def heuristic(cell):
+            x, y, z = self.coords(cell)
+            return abs(x - gx) + abs(y - gy) + abs(z - gz)
+
+        g_cost = {source: 0}
+        parents = {source: -1}
+        heap = [(heuristic(source), 0, source)]
+        expansions = 0
+        while heap:
+            f, g, cell = heappop(heap)
+            if g > g_cost[cell]:
+                continue
+            if cell == goal:
+                path = []
+                while cell != -1:
+                    path.append(cell)
+                    cell = parents[cell]
+                path.reverse()
+                return path, expansions, False
+            expansions += 1
+            if deadline is not None and time.perf_counter() > deadline:
+                return None, expansions, False
+            if cell == source:
+                edges = list(start_edges.items())
+            else:
+                edges = self.edges_of(cell)
+            # старт тоже может оказаться входом: тогда из него можно сразу перейти грань
+            edges = edges + [(link, 1) for link in self.links_of(cell)]
+            if cell in goal_edges:
+                edges.append((goal, goal_edges[cell]))
+            for next_cell, cost in edges:
+                next_g = g + cost
+                if next_g >= g_cost.get(next_cell, next_g + 1):
+                    continue
+                g_cost[next_cell] = next_g
+                parents[next_cell] = cell
+                heappush(heap, (next_g + weight * heuristic(next_cell), next_g, next_cell))
+        return None, expansions, True
+
+    def waypoint(self, path, refine_chunks=REFINE_CHUNKS):
+        """Последняя клетка абстрактного пути в пределах refine_chunks блоков от старта (не считая стартового)."""
+        chunks = {self.chunk_of(path[0])}
+        point = path[0]
+        for cell in path[1:]:
+            chunks.add(self.chunk_of(cell))
+            if len(chunks) > refine_chunks + 1:
+                break
+            point = cell
+        return point
+
+
+class StoredChunkGraph(ChunkGraph):
+    """
+    Полный граф блоков, загруженный из map_cache: входы, рёбра и связи читаются прямо из массивов as_arrays
+    (обычно отображённых в память файлов) двоичным поиском, без переноса в словари python. Страницы читаются
+    с диска по мере обращения и общие у всех процессов, загрузивших один и тот же кеш.
+    """
+
+    def __init__(self, world, arrays, chunk_size=CHUNK_SIZE):
+        super().__init__(world, arrays["static"], chunk_size)
+        self.arrays = arrays
+
+    def entrances_of(self, chunk):
+        offsets = self.arrays["entrance_offsets"]
+        index = np.ravel_multi_index(chunk, self.counts)
+        return self.arrays["entrance_cells"][offsets[index]:offsets[index + 1]].tolist()
+
+    def edges_of(self, cell):
+        arrays = self.arrays
+        return csr_row(arrays["edge_cells"], arrays["edge_offsets"], arrays["edge_targets"], cell)
+
+    def links_of(self, cell):
+        arrays = self.arrays
+        return csr_row(arrays["link_cells"], arrays["link_offsets"], arrays["link_targets"], cell)
+
+
+def hierarchical_search(world, start, target, max_iterations=1000000, deadline=None, refine_chunks=REFINE_CHUNKS,
+                        waypoint=None):
+    """
+    Путь к далёкой цели через граф блоков (ChunkGraph): абстрактный путь по входам блоков, затем настоящий A*
+    по текущей карте (с телами змей) только до входа через refine_chunks блоков. Если путь уточнён до самой цели,
+    результат found, иначе — частичный путь к промежуточному входу: следующие блоки уточнятся на следующих ходах.
+    Если промежуточный вход занят или до него не дойти, ищется обычным A* к цели.
+    waypoint — промежуточный вход прошлого поиска той же змеи к той же цели; новый возвращается в result.waypoint
+    (None — в следующий раз искать заново). Хранит его вызывающий: граф общий для всех змей.
+    """
+    graph = world.chunk_graph()
+    source = world.encode(start)
+    goal = world.encode(target)
+    expansions = 0
+    # пока змея не дошла до промежуточного входа прошлого поиска к этой цели, путь уточняется к нему же:
+    # со взвешенной эвристикой поиск из соседних клеток может выбрать разные обходы, и змея застрянет между ними
+    if waypoint is None or waypoint == source or graph.chunk_distance(source, waypoint) > refine_chunks:
+        path, expansions, unreachable = graph.abstract_path(source, goal, deadline)
+        if unreachable:
+            # заборы отрезают цель целиком
+            return SearchResult([], expansions, False, exhausted=True)
+        if path is None:
+            return SearchResult([], expansions, False)
+        waypoint = graph.waypoint(path, refine_chunks)
+    if waypoint != source and (waypoint == goal or not world.blocked_flat[waypoint]):
+        result = a_star(world, start, world.decode(waypoint), max_iterations, deadline)
+        if result.found:
+            refined = SearchResult(result.path, expansions + result.expansions, waypoint == goal)
+            refined.waypoint = waypoint
+            return refined
+        expansions += result.expansions
+    result = a_star(world, start, target, max_iterations, deadline)
+    result.expansions += expansions
+    return result
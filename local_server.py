@@ -0,0 +1,405 @@
+import argparse
+import asyncio
+import multiprocessing
+import random
+import time
+from collections import Counter
+
+from aiohttp import web
+
+from api import Api, dumps, loads
+from scheduler import TickScheduler
+from state import GameState
+from world import DIRECTIONS
+
+MOVE_PATH = "/play/snake3d/player/move"
+
+
+class LocalSnake:
+    """Змея на локальном сервере. Геометрия — список клеток-кортежей, голова первая."""
+
+    __slots__ = ("id", "direction", "geometry", "status", "death_count", "revive_at")
+
+    def __init__(self, snake_id, cell, direction):
+        self.id = snake_id
+        self.direction = direction
+        self.geometry = [cell]
+        self.status = "alive"
+        self.death_count = 0
+        self.revive_at = 0  # когда мёртвая змея оживёт, с по time.time()
+
+    def is_alive(self):
+        return self.status == "alive"
+
+
+class Player:
+    def __init__(self, token, snakes):
+        self.token = token
+        self.snakes = snakes
+        self.points = 0
+        self.errors = []
+        self.moved = False  # в текущем тике пришёл ход
+        self.ticks = 0  # тиков, когда у игрока были живые змеи
+        self.missed = 0  # из них без хода
+        self.requests = 0
+
+
+class GameServer:
+    """
+    Локальная замена игрового сервера snake3d: тот же контракт POST /play/snake3d/player/move.
+    Тики идут по часам раз в tick_ms, независимо от запросов. Ход применяется к ближайшему тику,
+    змеи двигаются, едят еду и растут, погибают о заборы, тела и края карты и оживают через
+    revive_timeout_sec. Задержка сети (latency_ms ± jitter_ms, половина на запрос, половина на ответ),
+    ошибки 500 (error_rate) и потерянные ответы (drop_rate) добавляются искусственно.
+    GET /stats — счётчики тиков без хода по игрокам.
+    """
+
+    def __init__(self, map_size=(180, 180, 60), tick_ms=1000, fence_count=9000, food_count=700,
+                 snakes_per_player=3, revive_timeout_sec=5, latency_ms=0, jitter_ms=0, error_rate=0.0,
+                 drop_rate=0.0, seed=0):
+        self.map_size = tuple(map_size)
+        self.tick_ms = tick_ms
+        self.food_count = food_count
+        self.snakes_per_player = snakes_per_player
+        self.revive_timeout_sec = revive_timeout_sec
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+
+        self.fences = {self.random_cell() for _ in range(fence_count)}
+        self.fence_list = [list(cell) for cell in self.fences]
+        self.food = {}  # клетка -> цена
+        self.golden = {}
+        self.suspicious = {}
+        self.players = {}
+        self.turn = 0
+        self.next_tick = None  # время следующего тика, с по time.time()
+        self.clock_lag = 0  # тиков, начавшихся позже своего времени больше чем на 10% тика
+        self.spawn_food()
+
+        self.app = web.Application()
+        self.app.router.add_post(MOVE_PATH, self.handle_move)
+        self.app.router.add_route("HEAD", MOVE_PATH, self.handle_head)
+        self.app.router.add_get("/stats", self.handle_stats)
+        self.app.on_startup.append(self.start_clock)
+        self.app.on_cleanup.append(self.stop_clock)
+
+    def random_cell(self):
+        return tuple(self.random.randrange(size) for size in self.map_size)
+
+    def in_bounds(self, cell):
+        return all(0 <= cell[i] < self.map_size[i] for i in range(3))
+
+    def occupied(self):
+        cells = set(self.fences)
+        for player in self.players.values():
+            for snake in player.snakes:
+                cells.update(snake.geometry)
+        return cells
+
+    def free_cell(self, occupied):
+        while True:
+            cell = self.random_cell()
+            if cell not in occupied:
+                return cell
+
+    def spawn_food(self):
+        """Досыпает еду до заданного количества; золотой и подозрительной — по доле от обычной."""
+        occupied = self.occupied()
+        for layer, count, price in (
+            (self.food, self.food_count, lambda: self.random.randint(1, 50)),
+            (self.golden, self.food_count // 20, lambda: 500),
+            (self.suspicious, self.food_count // 15, lambda: self.random.choice((-100, 50))),
+        ):
+            while len(layer) < count:
+                layer[self.free_cell(occupied)] = price()
+
+    def add_player(self, token):
+        occupied = self.occupied()
+        snakes = []
+        for _ in range(self.snakes_per_player):
+            cell = self.free_cell(occupied)
+            occupied.add(cell)
+            snakes.append(LocalSnake("%040x" % self.random.getrandbits(160), cell, self.random.choice(DIRECTIONS)))
+        player = Player(token, snakes)
+        self.players[token] = player
+        return player
+
+    async def start_clock(self, app):
+        self.clock = asyncio.create_task(self.run_clock())
+
+    async def stop_clock(self, app):
+        self.clock.cancel()
+
+    async def run_clock(self):
+        self.next_tick = time.time() + self.tick_ms / 1000
+        while True:
+            await asyncio.sleep(max(0.0, self.next_tick - time.time()))
+            if time.time() - self.next_tick > self.tick_ms / 10000:
+                self.clock_lag += 1
+            self.tick()
+            self.next_tick += self.tick_ms / 1000
+            if self.turn % 10 == 0:
+                print(self.stats_line())
+
+    def tick(self):
+        """Один ход игры: движение, столкновения, еда, оживление."""
+        now = time.time()
+        for player in self.players.values():
+            if any(snake.is_alive() for snake in player.snakes):
+                player.ticks += 1
+                player.missed += not player.moved
+            player.moved = False
+
+        moving = [snake for player in self.players.values() for snake in player.snakes if snake.is_alive()]
+        heads = {}
+        for snake in moving:
+            head = snake.geometry[0]
+            heads[snake] = tuple(head[i] + snake.direction[i] for i in range(3))
+
+        # хвост уходит из клетки, если змея ничего не съела
+        eats = {snake: heads[snake] in self.food or heads[snake] in self.golden or heads[snake] in self.suspicious
+                for snake in moving}
+        bodies = Counter()
+        for player in self.players.values():
+            for snake in player.snakes:
+                if snake.is_alive():
+                    body = snake.geometry if eats[snake] else snake.geometry[:-1]
+                    bodies.update(body)
+        bodies.update(heads.values())
+
+        owners = {snake: player for player in self.players.values() for snake in player.snakes}
+        for snake in moving:
+            head = heads[snake]
+            if not self.in_bounds(head) or head in self.fences or bodies[head] > 1:
+                snake.status = "dead"
+                snake.geometry = []
+                snake.death_count += 1
+                snake.revive_at = now + self.revive_timeout_sec
+                continue
+            snake.geometry.insert(0, head)
+            if eats[snake]:
+                player = owners[snake]
+                for layer in (self.food, self.golden, self.suspicious):
+                    player.points += layer.pop(head, 0)
+            else:
+                snake.geometry.pop()
+
+        occupied = None
+        for snake in owners:
+            if snake.status == "dead" and snake.revive_at <= now:
+                if occupied is None:
+                    occupied = self.occupied()
+                cell = self.free_cell(occupied)
+                occupied.add(cell)
+                snake.status = "alive"
+                snake.geometry = [cell]
+                snake.direction = self.random.choice(DIRECTIONS)
+        self.spawn_food()
+        self.turn += 1
+
+    def apply_moves(self, player, snakes):
+        """Запоминает направления змей; они применятся в ближайшем тике."""
+        player.errors = []
+        by_id = {snake.id: snake for snake in player.snakes}
+        for move in snakes:
+            snake = by_id.get(move.get("id"))
+            direction = move.get("direction")
+            if snake is None:
+                player.errors.append(f"unknown snake {move.get('id')}")
+                continue
+            if not isinstance(direction, list) or len(direction) != 3 or sorted(map(abs, direction)) != [0, 0, 1]:
+                player.errors.append(f"invalid direction {direction} for snake {snake.id}")
+                continue
+            if len(snake.geometry) > 1 and all(direction[i] == -snake.direction[i] for i in range(3)):
+                player.errors.append(f"snake {snake.id} can not turn back")
+                continue
+            snake.direction = tuple(direction)
+        player.moved = True
+
+    def state_for(self, player):
+        """Ответ сервера для игрока в формате игры. Пока часы не запущены, до тика остаётся целый тик."""
+        now = time.time()
+        tick_remain_ms = self.tick_ms if self.next_tick is None else max(0, int((self.next_tick - now) * 1000))
+        snakes = []
+        enemies = []
+        for other in self.players.values():
+            for snake in other.snakes:
+                geometry = [list(cell) for cell in snake.geometry]
+                if other is player:
+                    snakes.append({
+                        "id": snake.id, "direction": list(snake.direction), "oldDirection": list(snake.direction),
+                        "geometry": geometry, "deathCount": snake.death_count, "status": snake.status,
+                        "reviveRemainMs": max(0, int((snake.revive_at - now) * 1000)),
+                    })
+                else:
+                    enemies.append({"geometry": geometry, "status": snake.status, "kills": 0})
+        return {
+            "mapSize": list(self.map_size),
+            "name": player.token[:16],
+            "points": player.points,
+            "fences": self.fence_list,
+            "snakes": snakes,
+            "enemies": enemies,
+            "food": [{"c": list(cell), "points": points, "type": 0} for cell, points in self.food.items()],
+            "specialFood": {
+                "golden": [list(cell) for cell in self.golden],
+                "suspicious": [list(cell) for cell in self.suspicious],
+            },
+            "turn": self.turn,
+            "tickRemainMs": tick_remain_ms,
+            "reviveTimeoutSec": self.revive_timeout_sec,
+            "errors": player.errors,
+        }
+
+    def delay(self):
+        """Задержка в одну сторону, с."""
+        latency = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(0.0, latency) / 2000
+
+    async def handle_move(self, request):
+        body = await request.read()
+        await asyncio.sleep(self.delay())
+        if self.random.random() < self.error_rate:
+            return web.Response(status=500, text="injected error")
+        token = request.headers.get("X-Auth-Token", "")
+        player = self.players.get(token) or self.add_player(token)
+        player.requests += 1
+        self.apply_moves(player, loads(body).get("snakes", []))
+        response = dumps(self.state_for(player))
+        if self.random.random() < self.drop_rate:
+            # ответ потерян: клиент дождётся своего таймаута
+            await asyncio.sleep(self.tick_ms * 10 / 1000)
+        await asyncio.sleep(self.delay())
+        return web.Response(body=response, content_type="application/json")
+
+    async def handle_head(self, request):
+        return web.Response()
+
+    async def handle_stats(self, request):
+        return web.json_response({
+            "turn": self.turn,
+            "clock_lag": self.clock_lag,
+            "players": {
+                player.token[:16]: {
+                    "points": player.points, "requests": player.requests, "ticks": player.ticks,
+                    "missed": player.missed,
+                    "deaths": sum(snake.death_count for snake in player.snakes),
+                }
+                for player in self.players.values()
+            },
+        })
+
+    def stats_line(self):
+        ticks = sum(player.ticks for player in self.players.values())
+        missed = sum(player.missed for player in self.players.values())
+        rate = missed / ticks if ticks else 0
+        return (f"turn {self.turn}: players {len(self.players)}, missed ticks {missed}/{ticks} ({rate:.1%}), "
+                f"clock lag {self.clock_lag}")
+
+
+def bot_moves(res, fences, random_source):
+    """Ходы простого бота: прямо, а если впереди препятствие — в случайную свободную сторону."""
+    occupied = set(fences)
+    for snake in res["snakes"]:
+        occupied.update(map(tuple, snake["geometry"]))
+    for enemy in res["enemies"]:
+        occupied.update(map(tuple, enemy["geometry"]))
+    map_size = res["mapSize"]
+    moves = []
+    for snake in res["snakes"]:
+        if not snake["geometry"]:
+            continue
+        head = snake["geometry"][0]
+        back = tuple(-d for d in snake["direction"])
+        options = [tuple(snake["direction"])] + random_source.sample(DIRECTIONS, len(DIRECTIONS))
+        for direction in options:
+            cell = tuple(head[i] + direction[i] for i in range(3))
+            if direction == back or cell in occupied or not all(0 <= cell[i] < map_size[i] for i in range(3)):
+                continue
+            moves.append({"id": snake["id"], "direction": list(direction)})
+            break
+    return moves
+
+
+async def run_bot(url, token, seed):
+    """Бот-клиент: тот же Api и TickScheduler, что у App, чтобы нагрузка была похожа на настоящую."""
+    random_source = random.Random(seed)
+    api = Api(token, url=url)
+    scheduler = TickScheduler(api)
+    fences = None
+    req = {"snakes": []}
+    try:
+        while True:
+            res = await api.move(req, scheduler.request_timeout_ms())
+            if res is None:
+                await asyncio.sleep(0.1)
+                continue
+            if fences is None:
+                fences = set(map(tuple, res["fences"]))  # заборы не меняются
+            if not scheduler.on_response(GameState.parse(res)):
+                await scheduler.wait_tick_end()
+                continue
+            req = {"snakes": bot_moves(res, fences, random_source)}
+            delay = scheduler.time_to_send_ms()
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+    finally:
+        await api.close()
+
+
+async def run_bots(url, bots):
+    await asyncio.gather(*(run_bot(url, f"bot{i:04d}", i) for i in range(bots)))
+
+
+def bots_main(url, bots):
+    asyncio.run(run_bots(url, bots))
+
+
+async def serve(server, host, port, bots):
+    runner = web.AppRunner(server.app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    url = f"http://{host}:{port}{MOVE_PATH}"
+    print("serving", url)
+    process = None
+    if bots:
+        # боты в отдельном процессе, чтобы их разбор ответов не сбивал часы сервера
+        process = multiprocessing.get_context("spawn").Process(target=bots_main, args=(url, bots), daemon=True)
+        process.start()
+    try:
+        await asyncio.Event().wait()
+    finally:
+        if process is not None:
+            process.terminate()
+        await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальный сервер snake3d для проверки таймингов и нагрузки")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--map", type=int, nargs=3, default=[180, 180, 60], metavar=("X", "Y", "Z"))
+    parser.add_argument("--tick-ms", type=int, default=1000)
+    parser.add_argument("--fences", type=int, default=9000)
+    parser.add_argument("--food", type=int, default=700)
+    parser.add_argument("--snakes", type=int, default=3, help="змей у каждого игрока")
+    parser.add_argument("--revive-sec", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=0, help="задержка запроса туда и обратно")
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0, help="доля ответов 500")
+    parser.add_argument("--drop-rate", type=float, default=0, help="доля потерянных ответов")
+    parser.add_argument("--bots", type=int, default=0, help="ботов-клиентов (в отдельном процессе)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    server = GameServer(
+        args.map, args.tick_ms, args.fences, args.food, args.snakes, args.revive_sec,
+        args.latency_ms, args.jitter_ms, args.error_rate, args.drop_rate, args.seed,
+    )
+    asyncio.run(serve(server, args.host, args.port, args.bots))
+
+
+if __name__ == '__main__':
+    main()
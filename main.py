@@ -1,15 +1,35 @@
 import asyncio
+import logging
 import traceback
+
+import metrics
 from app import App
 
 with open("token", 'r') as file:
     TOKEN = file.read()
 DEBUG = False
 MOCK = False
+# процессов для параллельного планирования змей; 0 — планировать в основном процессе
+WORKERS = 3
+# файл для записи ходов (проигрывается через replay.py); None — не записывать
+RECORD = None
+# адрес хода вместо игрового сервера, например "http://127.0.0.1:8080/play/snake3d/player/move" для local_server.py
+URL = None
+# порт GET /metrics (Prometheus) и файл трасс тиков JSONL; None — выключено
+METRICS_PORT = None
+TRACE = None
+# DEBUG — все ходы и цели змей, INFO — только предупреждения и редкие события
+LOG_LEVEL = logging.INFO
+# каталог с графом блоков карты между запусками (map_cache.py); None — не сохранять
+MAP_CACHE = "map_cache"
+# окно визуализации в отдельном процессе; False — без окна и без импорта vpython
+VISUALIZE = True
 
 
 async def main():
-    app = App(TOKEN, DEBUG, MOCK)
+    metrics.setup_logging(LOG_LEVEL)
+    app = App(TOKEN, DEBUG, MOCK, WORKERS, record_path=RECORD, url=URL, metrics_port=METRICS_PORT,
+              trace_path=TRACE, visualize=VISUALIZE, map_cache_dir=MAP_CACHE)
     try:
         await app.run()
     except Exception as e:
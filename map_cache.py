@@ -0,0 +1,139 @@
+import argparse
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+
+import numpy as np
+
+from hpa import ChunkGraph, StoredChunkGraph, CHUNK_SIZE
+
+log = logging.getLogger(__name__)
+
+# каталог кеша по умолчанию
+CACHE_DIR = "map_cache"
+# версия формата файлов: входит в ключ, так что кеш старого формата просто строится заново
+FORMAT_VERSION = 2
+ARRAYS = (
+    "static", "entrance_offsets", "entrance_cells", "edge_cells", "edge_offsets", "edge_targets",
+    "link_cells", "link_offsets", "link_targets",
+)
+
+
+class MapCache:
+    """
+    Статичная часть карты на диске: маска заборов и полный граф блоков для иерархического поиска (hpa.ChunkGraph).
+    Ключ — размер карты, размер блока и хеш набора заборов, так что после перезапуска на той же карте
+    граф берётся готовым, а на другой карте строится заново — целиком, в отдельном процессе (build_in_background).
+    Каждый массив лежит отдельным .npy и загружается через отображение в память; загруженный граф
+    (hpa.StoredChunkGraph) читает входы и рёбра прямо из этих массивов, так что чтение с диска идёт
+    по мере обращения, а процессы-планировщики делят одни и те же страницы.
+    """
+
+    def __init__(self, directory=CACHE_DIR, chunk_size=CHUNK_SIZE):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.building = set()  # ключи, граф для которых строится в отдельном процессе
+
+    def key(self, world):
+        digest = hashlib.sha1(np.ascontiguousarray(world.fences, dtype=np.int64).tobytes()).hexdigest()[:16]
+        sx, sy, sz = world.map_size
+        return f"v{FORMAT_VERSION}-{sx}x{sy}x{sz}-c{self.chunk_size}-{digest}"
+
+    def path(self, world):
+        return os.path.join(self.directory, self.key(world))
+
+    def load(self, world):
+        """Граф блоков для заборов мира или None, если его нет на диске или файлы повреждены."""
+        path = self.path(world)
+        try:
+            arrays = {name: np.load(os.path.join(path, name + ".npy"), mmap_mode="r") for name in ARRAYS}
+            if arrays["static"].shape != world.shape:
+                return None
+        except (OSError, ValueError) as e:
+            if not isinstance(e, FileNotFoundError):
+                log.warning("map cache %s is unreadable: %s", path, e)
+            return None
+        log.info("map cache %s: loaded", path)
+        return StoredChunkGraph(world, arrays, self.chunk_size)
+
+    def save(self, world):
+        """
+        Достраивает граф блоков мира до всей карты и сохраняет его. Файлы пишутся во временный каталог,
+        который затем заменяет прежний целиком. Граф, загруженный с диска, не сохраняется.
+        """
+        graph = world.chunks
+        if graph is None:
+            graph = world.chunks = ChunkGraph(world, ChunkGraph.static_mask(world, world.fences), self.chunk_size)
+        if isinstance(graph, StoredChunkGraph):
+            return False
+        path = self.path(world)
+        temporary = f"{path}.tmp{os.getpid()}"
+        os.makedirs(temporary, exist_ok=True)
+        for name, array in graph.as_arrays().items():
+            np.save(os.path.join(temporary, name + ".npy"), array)
+        with open(os.path.join(temporary, "meta.json"), "w") as file:
+            json.dump({"map_size": world.map_size, "chunk_size": self.chunk_size, "chunks": len(graph.edges)}, file)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(temporary, path)
+        log.info("map cache %s: saved %s chunks", path, len(graph.edges))
+        return True
+
+    def build_in_background(self, world):
+        """
+        Если графа для заборов мира нет на диске, строит и сохраняет его в отдельном процессе с пониженным
+        приоритетом: процессор уходит на это не в ущерб планированию, а ход не ждёт записи файлов.
+        Процесс не фоновый (daemon=False): при выходе программа дождётся, пока граф допишется.
+        :return: запущенный процесс или None
+        """
+        key = self.key(world)
+        if key in self.building or os.path.isdir(os.path.join(self.directory, key)):
+            return None
+        self.building.add(key)
+        log.info("map cache %s: building in background", key)
+        process = multiprocessing.get_context("spawn").Process(
+            target=build_main, args=(self.directory, self.chunk_size, world.map_size, world.fences), name="map_cache"
+        )
+        process.start()
+        return process
+
+
+def build_main(directory, chunk_size, map_size, fences):
+    """Процесс MapCache.build_in_background."""
+    from world import World
+
+    if hasattr(os, "nice"):
+        os.nice(10)
+    world = World(map_size)
+    world.set_fences(fences)
+    began = time.perf_counter()
+    MapCache(directory, chunk_size).save(world)
+    log.info("map cache built in %.1f s", time.perf_counter() - began)
+
+
+def main():
+    """Строит граф блоков всей карты по записанному ответу сервера и сохраняет в кеш заранее."""
+    from api import loads
+    from state import GameState
+    from world import World
+
+    parser = argparse.ArgumentParser(description="Заранее посчитать статичную часть карты")
+    parser.add_argument("response", help="ответ сервера в JSON, например example_response.json")
+    parser.add_argument("--dir", default=CACHE_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.response, "rb") as file:
+        state = GameState.parse(loads(file.read()))
+    world = World(state.map_size)
+    world.build(state)
+    began = time.perf_counter()
+    MapCache(args.dir).save(world)
+    log.info("built in %.1f s", time.perf_counter() - began)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# границы корзин гистограмм, мс
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами, как в Prometheus: счётчики по корзинам, сумма и количество."""
+
+    def __init__(self, buckets=BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя корзина — больше всех границ
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """Верхняя граница корзины, в которую попадает квантиль q."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def as_dict(self):
+        return {"count": self.count, "sum": self.sum, "buckets": dict(zip(map(str, self.buckets), self.counts)),
+                "p50": self.quantile(0.5), "p99": self.quantile(0.99)}
+
+
+class Span:
+    """Измеренный этап тика: имя, длительность и атрибуты (змея, режим планирования, раскрытия)."""
+
+    __slots__ = ("name", "attrs", "ms")
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.ms = 0.0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def as_dict(self):
+        return {"name": self.name, "ms": round(self.ms, 3), **self.attrs}
+
+
+histograms = {}
+counters = {}
+# открытые спаны своего потока, внутренний — последний
+_local = threading.local()
+# спаны текущего тика и файл, куда тики пишутся строками JSON
+_trace = None
+_trace_start = 0.0
+_trace_file = None
+
+
+@contextmanager
+def span(name, **attrs):
+    """Замеряет блок кода: длительность уходит в гистограмму name и в трассу текущего тика."""
+    current = Span(name, attrs)
+    stack = _open_spans()
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.ms = (time.perf_counter() - start) * 1000
+        stack.pop()
+        record(current.as_dict())
+
+
+def _open_spans():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def annotate(**attrs):
+    """Добавляет атрибуты к самому внутреннему открытому спану, если он есть."""
+    stack = _open_spans()
+    if stack:
+        stack[-1].attrs.update(attrs)
+
+
+def record(span_dict):
+    """Учитывает готовый спан, в том числе пришедший из процесса-планировщика."""
+    observe(span_dict["name"], span_dict["ms"])
+    if _trace is not None:
+        _trace["spans"].append(span_dict)
+
+
+def observe(name, value):
+    if name not in histograms:
+        histograms[name] = Histogram()
+    histograms[name].observe(value)
+
+
+def count(name, value=1):
+    counters[name] = counters.get(name, 0) + value
+
+
+def begin_tick(**attrs):
+    """Начинает трассу тика; прошлый тик, если не закрыт, закрывается."""
+    global _trace, _trace_start
+    end_tick()
+    _trace = {"time": time.time(), **attrs, "spans": []}
+    _trace_start = time.perf_counter()
+
+
+def set_tick(**attrs):
+    """Атрибуты текущего тика (номер хода, бюджет), когда они становятся известны."""
+    if _trace is not None:
+        _trace.update(attrs)
+
+
+def end_tick(**attrs):
+    global _trace
+    if _trace is None:
+        return
+    _trace.update(attrs)
+    _trace["ms"] = round((time.perf_counter() - _trace_start) * 1000, 3)
+    observe("tick", _trace["ms"])
+    if _trace_file is not None:
+        _trace_file.write(json.dumps(_trace) + "\n")
+        _trace_file.flush()
+    _trace = None
+
+
+def open_trace(path):
+    """Включает запись трасс тиков в файл JSONL (строка — тик)."""
+    global _trace_file
+    _trace_file = open(path, "a")
+
+
+def snapshot():
+    return {"histograms": {name: h.as_dict() for name, h in histograms.items()}, "counters": dict(counters)}
+
+
+def prometheus_text(prefix="snake_"):
+    """Метрики в текстовом формате Prometheus."""
+    lines = []
+    for name, histogram in sorted(histograms.items()):
+        metric = prefix + name + "_ms"
+        lines.append(f"# TYPE {metric} histogram")
+        total = 0
+        for bound, count in zip(histogram.buckets, histogram.counts):
+            total += count
+            lines.append(f'{metric}_bucket{{le="{bound}"}} {total}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram.count}')
+        lines.append(f"{metric}_sum {histogram.sum}")
+        lines.append(f"{metric}_count {histogram.count}")
+    for name, value in sorted(counters.items()):
+        lines.append(f"# TYPE {prefix}{name}_total counter")
+        lines.append(f"{prefix}{name}_total {value}")
+    return "\n".join(lines) + "\n"
+
+
+async def serve(port, host="127.0.0.1"):
+    """Поднимает GET /metrics (Prometheus) и GET /metrics.json. Возвращает runner для остановки."""
+    from aiohttp import web
+
+    async def handle_text(request):
+        return web.Response(text=prometheus_text())
+
+    async def handle_json(request):
+        return web.json_response(snapshot())
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_text)
+    app.router.add_get("/metrics.json", handle_json)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Пропускает одно сообщение с одним шаблоном не чаще раза в interval секунд.
+    Ключ — шаблон, а не готовая строка: "snake %s missed the deadline" для всех змей считается одним сообщением.
+    Сколько сообщений пропущено, дописывается к следующему пропущенному фильтром.
+    """
+
+    def __init__(self, interval=1.0):
+        super().__init__()
+        self.interval = interval
+        self.last = {}
+        self.suppressed = {}
+
+    def filter(self, record):
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        if now - self.last.get(key, -self.interval) < self.interval:
+            self.suppressed[key] = self.suppressed.get(key, 0) + 1
+            return False
+        self.last[key] = now
+        suppressed = self.suppressed.pop(key, 0)
+        if suppressed:
+            record.msg = f"{record.msg} [+{suppressed} suppressed]"
+        return True
+
+
+def setup_logging(level=logging.INFO, interval=1.0):
+    """Лог в stderr с ограничением частоты одинаковых сообщений."""
+    handler = logging.StreamHandler()
+    handler.addFilter(RateLimitFilter(interval))
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
@@ -1,21 +1,39 @@
-from vpython import canvas, vector, box, color, rate
-import asyncio
+from vpython import canvas, vector, box, color, compound
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+# заборы объединяются в составные объекты по блокам FENCE_CHUNK^3 клеток
+FENCE_CHUNK = 16
+
+HEAD_COLOR = (0, 1, 1)  # color.cyan
+BODY_COLOR = (0, 0, 1)  # color.blue
+GOLDEN_COLOR = (1, 1, 0)  # color.yellow
+SUSPICIOUS_COLOR = (1, 0, 1)  # color.magenta
+PATH_COLOR = (0, 0, 0)  # color.black
 
 
 class SnakeGame3D:
 
-    def __init__(self, game_state, fps=10):
+    def __init__(self, game_state, fps=10, radius=20):
         """
         Инициализация визуализации игры с добавлением канвасов.
+        Отрисовка с сохранением объектов: на кадре меняются только кубы, которые появились, исчезли
+        или сменили цвет. Рисуется только куб со стороной 2 * radius + 1 вокруг головы змеи,
+        поэтому время кадра не зависит от размера карты.
         :param game_state: Начальное состояние игры.
         :param fps: Количество обновлений в секунду для ограничения частоты.
+        :param radius: Сколько клеток от головы змеи видно на её канвасе.
         """
         self.game_state = game_state
         self.fps = fps  # Число кадров в секунду
+        self.radius = radius
         self.canvas_instances = []  # Статический атрибут для хранения всех созданных канвасов
         self.paths = {}
-        snakes_count = len(game_state["snakes"])
-        print(f"got {str(snakes_count)} snakes")
+        snakes_count = len(game_state.snakes)
+        log.info("got %s snakes", snakes_count)
         # Проверяем, созданы ли уже канвасы
         if len(self.canvas_instances) == 0:
             for i in range(snakes_count):
@@ -27,117 +45,159 @@ class SnakeGame3D:
                     background=color.white  # Исходный фон
                 ))
 
-        # Уникальный список всех объектов для проверки пересечений
-        self.objects = [{} for _ in range(snakes_count)]  # Отслеживаем объекты для каждого канваса
+        # Нарисованные кубы каждого канваса: клетка -> (объект, цвет)
+        self.objects = [{} for _ in range(snakes_count)]
+        # Скрытые кубы, которые переиспользуются вместо создания новых: vpython не удаляет объекты
+        self.free_objects = [[] for _ in range(snakes_count)]
+        # Заборы статичны: клетки по блокам и составные объекты блоков каждого канваса, создаются при первом показе
+        self.fences = None
+        self.fence_groups = {}
+        self.fence_chunks = [{} for _ in range(snakes_count)]
+        # Центр отсечения канваса: голова змеи, а пока змея мертва — место, где она была
+        self.centers = [np.array(game_state.map_size) // 2 for _ in range(snakes_count)]
+        # Что нарисовано на канвасе: состояние и пути, по которым строился кадр
+        self.rendered = [None] * snakes_count
 
         # Запускаем визуализацию сразу для всех канвасов
         self.visualize_all()
 
-    def clear_canvas(self, canvas_id):
-        """Удалить объекты из канваса, которые больше не обновляются."""
-        for obj in list(self.objects[canvas_id].values()):
-            obj.visible = False  # Скройте объект, чтобы освободить память
-        self.objects[canvas_id] = {}
-
-    def draw_object(self, canvas_instance, position, size, color_value, canvas_id, key):
+    def draw_object(self, canvas_instance, position, color_value, canvas_id):
         """
-        Добавляет или обновляет объект на канвасе.
-        :param canvas_instance: Канвас для отрисовки объекта.
-        :param position: Позиция объекта в пространстве.
-        :param size: Размер объекта.
-        :param color_value: Цвет объекта.
-        :param canvas_id: ID канваса.
-        :param key: Уникальный ключ объекта (например, его позиция).
+        Добавляет куб в клетку или перекрашивает уже нарисованный.
+        :param position: Клетка (кортеж координат), она же ключ объекта.
+        :param color_value: Цвет кортежем (r, g, b).
         """
-        pos_tuple = tuple(position)
-        if key in self.objects[canvas_id]:  # Если объект существует, обновляем его
-            obj = self.objects[canvas_id][key]
-            obj.pos = vector(*pos_tuple)
-        else:  # Иначе создаем новый объект
-            self.objects[canvas_id][key] = box(pos=vector(*pos_tuple), size=size, color=color_value,
-                                               canvas=canvas_instance)
+        objects = self.objects[canvas_id]
+        current = objects.get(position)
+        if current is None:
+            free = self.free_objects[canvas_id]
+            if free:
+                obj = free.pop()
+                obj.pos = vector(*position)
+                obj.color = vector(*color_value)
+                obj.visible = True
+            else:
+                obj = box(pos=vector(*position), size=vector(1, 1, 1), color=vector(*color_value),
+                          canvas=canvas_instance)
+            objects[position] = (obj, color_value)
+        elif current[1] != color_value:
+            current[0].color = vector(*color_value)
+            objects[position] = (current[0], color_value)
+
+    def remove_object(self, position, canvas_id):
+        obj, _ = self.objects[canvas_id].pop(position)
+        obj.visible = False
+        self.free_objects[canvas_id].append(obj)
+
+    def group_fences(self):
+        """Раскладывает клетки заборов по блокам, если заборы сменились (новая карта)."""
+        fences = self.game_state.fences
+        if self.fences is not None and np.array_equal(self.fences, fences):
+            return
+        self.fences = fences
+        self.fence_groups = {}
+        for cell, chunk in zip(fences.tolist(), (fences // FENCE_CHUNK).tolist()):
+            self.fence_groups.setdefault(tuple(chunk), []).append(cell)
+        for chunks in self.fence_chunks:
+            for obj in chunks.values():
+                obj.visible = False
+            chunks.clear()
 
     def draw_fences(self, canvas_instance, canvas_id):
-        for fence in self.game_state["fences"]:
-            self.draw_object(canvas_instance, position=fence, size=vector(1, 1, 1), color_value=color.green,
-                             canvas_id=canvas_id, key=tuple(fence))
-
-    def draw_food(self, canvas_instance, canvas_id):
-        for food in self.game_state["food"]:
-            food_color = self.parse_color_by_points(food["points"])
-            self.draw_object(canvas_instance, position=food["c"], size=vector(1, 1, 1), color_value=food_color,
-                             canvas_id=canvas_id, key=tuple(food["c"]))
-        for special_type, special_list in self.game_state["specialFood"].items():
-            special_color = color.yellow if special_type == "golden" else color.magenta
-            for position in special_list:
-                self.draw_object(canvas_instance, position=position, size=vector(1, 1, 1), color_value=special_color,
-                                 canvas_id=canvas_id, key=tuple(position))
-
-    def draw_snake(self, canvas_instance, canvas_id, snake):
-        canvas_instance.title = f"Snake-{canvas_id+1} [{snake["status"]}]"
-        if snake["status"] != "alive":
-            canvas_instance.title += f"{str(snake["reviveRemainMs"]/1000)}s"
-        geometry = snake["geometry"]
-        if geometry:
-            head_position = geometry[0]
-            canvas_instance.center = vector(*head_position)  # Центрируем камеру на голове змеи
-        for i, segment in enumerate(geometry):
-            seg_color = color.blue if i > 0 else color.cyan
-            self.draw_object(canvas_instance, position=segment, size=vector(1, 1, 1), color_value=seg_color,
-                             canvas_id=canvas_id, key=tuple(segment))
-
-    def draw_enemies(self, canvas_instance, canvas_id):
-        for enemy in self.game_state["enemies"]:
-            geometry = enemy["geometry"]
-            for i, segment in enumerate(geometry):
-                seg_color = color.cyan if i == 0 else color.blue
-                self.draw_object(canvas_instance, position=segment, size=vector(1, 1, 1),
-                                 color_value=seg_color, canvas_id=canvas_id, key=tuple(segment))
-
-    def draw_paths(self, canvas_instance, canvas_id, snake_id):
+        """Показывает блоки заборов, пересекающие область вокруг головы, остальные прячет."""
+        center = self.centers[canvas_id]
+        low = (center - self.radius) // FENCE_CHUNK
+        high = (center + self.radius) // FENCE_CHUNK
+        chunks = self.fence_chunks[canvas_id]
+        for chunk, obj in chunks.items():
+            visible = all(low[i] <= chunk[i] <= high[i] for i in range(3))
+            if obj.visible != visible:
+                obj.visible = visible
+        for x in range(low[0], high[0] + 1):
+            for y in range(low[1], high[1] + 1):
+                for z in range(low[2], high[2] + 1):
+                    chunk = (x, y, z)
+                    if chunk in chunks or chunk not in self.fence_groups:
+                        continue
+                    boxes = [box(pos=vector(*cell), size=vector(1, 1, 1), color=color.green, canvas=canvas_instance)
+                             for cell in self.fence_groups[chunk]]
+                    chunks[chunk] = compound(boxes)
+
+    def near(self, coords, canvas_id):
+        """Клетки массива координат, попадающие в область отрисовки канваса, списком кортежей."""
+        if len(coords) == 0:
+            return []
+        inside = np.all(np.abs(coords - self.centers[canvas_id]) <= self.radius, axis=1)
+        return list(map(tuple, coords[inside].tolist()))
+
+    def scene(self, canvas_id, snake):
+        """Клетки, которые должны быть нарисованы на канвасе, и их цвета. Позже добавленное перекрывает раньшее."""
+        state = self.game_state
+        cells = {}
+        inside = np.all(np.abs(state.food_coords - self.centers[canvas_id]) <= self.radius, axis=1)
+        for position, points in zip(state.food_coords[inside].tolist(), state.food_points[inside].tolist()):
+            cells[tuple(position)] = self.parse_color_by_points(points)
+        for special_color, special_list in ((GOLDEN_COLOR, state.golden), (SUSPICIOUS_COLOR, state.suspicious)):
+            for position in self.near(special_list, canvas_id):
+                cells[position] = special_color
+        self.draw_paths(cells, canvas_id, snake.id)
+        self.draw_enemies(cells, canvas_id)
+        self.draw_snake(cells, canvas_id, snake)
+        return cells
+
+    def draw_snake(self, cells, canvas_id, snake):
+        for segment in self.near(snake.geometry[1:], canvas_id):
+            cells[segment] = BODY_COLOR
+        if snake.is_alive():
+            cells[tuple(snake.head())] = HEAD_COLOR
+
+    def draw_enemies(self, cells, canvas_id):
+        state = self.game_state
+        for segment in self.near(state.enemy_segments, canvas_id):
+            cells[segment] = BODY_COLOR
+        for segment in self.near(state.enemy_heads(), canvas_id):
+            cells[segment] = HEAD_COLOR
+
+    def draw_paths(self, cells, canvas_id, snake_id):
         path = self.paths.get(snake_id, [])
         if len(path) < 2:
             return
         crop_path = path[1:]
         if len(path) >= 3:
             crop_path = crop_path[:-1]
-        for segment in crop_path:
-            seg_color = color.black
-            self.draw_object(canvas_instance, position=segment, size=vector(1, 1, 1),
-                             color_value=seg_color, canvas_id=canvas_id, key=tuple(segment))
+        for segment in self.near(np.array(crop_path), canvas_id):
+            cells[segment] = PATH_COLOR
 
     def parse_color_by_points(self, points):
         if points <= 0:
-            return color.white
+            return 1, 1, 1  # Белый
         elif points < 50:
-            return vector(1, 1 - points / 50, 0)  # Переход от желтого к красному
+            return 1, 1 - points / 50, 0  # Переход от желтого к красному
         else:
-            return vector(1, 0, 0)  # Красный
+            return 1, 0, 0  # Красный
 
     def visualize(self, canvas_instance, canvas_id, snake):
-        self.clear_canvas(canvas_id)  # Удаляем старые объекты, если они больше не нужны
+        """Перерисовывает канвас по разнице между нарисованным и нужным; без изменений кадр пропускается."""
+        rendered = self.rendered[canvas_id]
+        if rendered is not None and rendered[0] is self.game_state and rendered[1] is self.paths:
+            return
+        self.rendered[canvas_id] = (self.game_state, self.paths)
+
+        canvas_instance.title = f"Snake-{canvas_id+1} [{snake.status}]"
+        if snake.status != "alive":
+            canvas_instance.title += f"{str(snake.revive_remain_ms/1000)}s"
+        if snake.is_alive():
+            self.centers[canvas_id] = snake.geometry[0].astype(np.int64)
+            canvas_instance.center = vector(*snake.head())  # Центрируем камеру на голове змеи
+
+        self.group_fences()
         self.draw_fences(canvas_instance, canvas_id)
-        self.draw_food(canvas_instance, canvas_id)
-        self.draw_snake(canvas_instance, canvas_id, snake)
-        self.draw_enemies(canvas_instance, canvas_id)
-        self.draw_paths(canvas_instance, canvas_id, snake["id"])
+        cells = self.scene(canvas_id, snake)
+        for position in [position for position in self.objects[canvas_id] if position not in cells]:
+            self.remove_object(position, canvas_id)
+        for position, color_value in cells.items():
+            self.draw_object(canvas_instance, position, color_value, canvas_id)
 
     def visualize_all(self):
-        for i, snake in enumerate(self.game_state["snakes"]):
+        for i, snake in enumerate(self.game_state.snakes):
             self.visualize(self.canvas_instances[i], i, snake)
-
-    async def visualize_all_async(self):
-        rate(self.fps)
-        print(f"visualizing {str(len(self.game_state["snakes"]))} snakes")
-        tasks = [self.visualize_async(self.canvas_instances[i], i, snake)
-                     for i, snake in enumerate(self.game_state["snakes"])]
-        await asyncio.gather(*tasks)
-
-    async def visualize_async(self, canvas_instance, canvas_id, snake):
-        self.clear_canvas(canvas_id)  # Очищаем старые объекты
-        self.draw_fences(canvas_instance, canvas_id)
-        self.draw_food(canvas_instance, canvas_id)
-        self.draw_snake(canvas_instance, canvas_id, snake)
-        self.draw_enemies(canvas_instance, canvas_id)
-        self.draw_paths(canvas_instance, canvas_id, snake["id"])
-        await asyncio.sleep(1 / self.fps)  # Контроль FPS
\ No newline at end of file
@@ -0,0 +1,101 @@
+import logging
+
+log = logging.getLogger(__name__)
+
+# новая еда считается заметно лучше цели, если её цена за шаг больше во столько раз
+BETTER_TARGET_FACTOR = 2
+# в каком радиусе от головы ищется заметно лучшая еда
+BETTER_TARGET_RADIUS = 6
+
+
+class PlanCache:
+    """
+    Пути змей с прошлых тиков, ключ — змея и клетка цели.
+    На новом тике путь не ищется заново: проверяется, что змея сделала шаг по пути, оставшиеся клетки пути
+    свободны к моменту, когда змея в них войдёт, цель на месте и рядом не появилось заметно лучшей еды.
+    Тогда путь сдвигается на шаг, и ход берётся из него.
+    """
+
+    def __init__(self, better_factor=BETTER_TARGET_FACTOR, better_radius=BETTER_TARGET_RADIUS):
+        self.better_factor = better_factor
+        self.better_radius = better_radius
+        self.plans = {}  # id змеи -> (путь от головы до цели в координатах, клетка цели)
+
+    def store(self, snake_id, path, world):
+        """Запоминает путь, если он ведёт к еде; пути centering и безопасного хода не кешируются."""
+        if len(path) >= 2 and world.value_flat[world.encode(path[-1])] > 0:
+            self.plans[snake_id] = ([list(cell) for cell in path], tuple(path[-1]))
+        else:
+            self.plans.pop(snake_id, None)
+
+    def follow(self, snake_id, head, world):
+        """
+        Ход по сохранённому пути или None, если путь надо искать заново.
+        :return: (направление, путь от текущей головы)
+        """
+        plan = self.plans.get(snake_id)
+        if plan is None:
+            return None
+        path, target = plan
+        head = list(head)
+        if len(path) >= 2 and path[1] == head:
+            path = path[1:]
+        elif path[0] != head:
+            # змея не пошла по пути: ход не дошёл до сервера или её убили и возродили
+            return self.drop(snake_id, "left the path")
+        if len(path) < 2:
+            return self.drop(snake_id, "reached the target")
+        if not self.is_free(path, world):
+            return self.drop(snake_id, "path is blocked")
+        if world.value_flat[world.encode(target)] <= 0:
+            return self.drop(snake_id, "target is gone")
+        if self.has_better_target(head, len(path) - 1, target, world):
+            return self.drop(snake_id, "better target nearby")
+        self.plans[snake_id] = (path, target)
+        return tuple(path[1][i] - path[0][i] for i in range(3)), path
+
+    def drop(self, snake_id, reason):
+        log.debug("replanning snake %s: %s", snake_id, reason)
+        del self.plans[snake_id]
+        return None
+
+    @staticmethod
+    def is_free(path, world):
+        """
+        Клетки пути свободны к моменту входа в них, по тем же правилам, что и в flood_fill:
+        на шаге depth нельзя туда, куда голова врага успевает за depth тиков, а тело врага проходимо,
+        если его хвост уйдёт раньше.
+        """
+        blocked = world.blocked_flat
+        reach = world.reach_flat
+        vacate = world.vacate_flat
+        for depth, position in enumerate(path[1:], 1):
+            if not world.in_bounds(position):
+                return False
+            cell = world.encode(position)
+            if reach[cell] <= depth:
+                return False
+            if blocked[cell] and not 0 < vacate[cell] < depth:
+                return False
+        return True
+
+    def has_better_target(self, head, steps, target, world):
+        """Есть ли рядом с головой еда с ценой за шаг в better_factor раз выше, чем у текущей цели."""
+        best = world.value_flat[world.encode(target)] / steps
+        for cell, price, _ in world.food_index.within_radius(head, self.better_radius):
+            if cell == target:
+                continue
+            distance = abs(cell[0] - head[0]) + abs(cell[1] - head[1]) + abs(cell[2] - head[2])
+            # манхэттенское расстояние — нижняя оценка числа шагов, так что оценка цены за шаг оптимистичная
+            if price / max(distance, 1) > self.better_factor * best:
+                return True
+        return False
+
+    def targets(self):
+        """Клетки целей сохранённых путей: другие змеи их не выбирают."""
+        return {target for _, target in self.plans.values()}
+
+    def retain(self, snake_ids):
+        """Забывает пути змей, которых нет среди snake_ids (погибли)."""
+        for snake_id in [snake_id for snake_id in self.plans if snake_id not in snake_ids]:
+            del self.plans[snake_id]
@@ -0,0 +1,106 @@
+import multiprocessing
+import time
+from multiprocessing.connection import wait
+
+import metrics
+from cubes import Cubes
+from map_cache import MapCache
+from world import World
+
+
+def worker_main(conn, map_cache_dir=None):
+    """
+    Цикл процесса-планировщика. Процесс держит свою копию мира и получает только изменения за ход.
+    Если сообщений накопилось несколько (процесс не успел за прошлый ход), применяются все изменения мира,
+    а планируются только запросы последнего хода.
+    """
+    world = None
+    # id змеи -> {цель: промежуточный вход} поиска через граф блоков; у каждой змеи свой
+    waypoints = {}
+    # граф блоков только читается из кеша: строит и сохраняет его отдельный процесс (MapCache.build_in_background)
+    map_cache = MapCache(map_cache_dir) if map_cache_dir else None
+    # модули загружены — процесс готов принимать ходы
+    conn.send("ready")
+    while True:
+        messages = [conn.recv()]
+        while conn.poll():
+            messages.append(conn.recv())
+
+        requests = []
+        for message in messages:
+            kind = message[0]
+            if kind == "stop":
+                return
+            if kind == "delta":
+                delta = message[1]
+                if delta.full or world is None:
+                    world = World(delta.map_size, delta.horizon, map_cache)
+                delta.apply(world)
+            elif kind == "plan":
+                requests.append(message)
+        if not requests:
+            continue
+        last_turn = max(request[1] for request in requests)
+
+        for _, turn, snake_id, head, deadline in requests:
+            if turn != last_turn:
+                continue
+            with metrics.span("plan_snake", snake=snake_id, worker=True) as span:
+                direction, path = Cubes.find_next_direction_to_center(
+                    world, head, deadline - time.time() * 1000, waypoints=waypoints.setdefault(snake_id, {})
+                )
+            conn.send((turn, snake_id, direction, path, span.as_dict()))
+
+
+class PlannerPool:
+    """
+    Постоянный пул процессов, которые параллельно планируют ходы наших змей.
+    Каждому процессу рассылаются изменения мира, змеи распределяются по процессам по кругу.
+    """
+
+    def __init__(self, workers, map_cache_dir=None):
+        context = multiprocessing.get_context("spawn")
+        self.connections = []
+        self.processes = []
+        for _ in range(workers):
+            parent_conn, child_conn = context.Pipe()
+            process = context.Process(target=worker_main, args=(child_conn, map_cache_dir), daemon=True)
+            process.start()
+            self.connections.append(parent_conn)
+            self.processes.append(process)
+        # ждём, пока процессы загрузят модули, чтобы первый ход не ушёл на запуск
+        for conn in self.connections:
+            conn.recv()
+
+    def plan(self, turn, delta, snakes, deadline):
+        """
+        Планирует ходы змей и ждет результаты не дольше deadline (мс, по time.time()).
+        :param snakes: список (id, голова)
+        :return: {id: (направление, путь)} для змей, успевших к сроку
+        """
+        if not delta.is_empty():
+            for conn in self.connections:
+                conn.send(("delta", delta))
+        for i, (snake_id, head) in enumerate(snakes):
+            self.connections[i % len(self.connections)].send(("plan", turn, snake_id, head, deadline))
+
+        results = {}
+        while len(results) < len(snakes):
+            timeout = (deadline - time.time() * 1000) / 1000
+            if timeout <= 0:
+                break
+            for conn in wait(self.connections, timeout):
+                result_turn, snake_id, direction, path, span = conn.recv()
+                # результаты прошлых ходов, опоздавшие к своему сроку, отбрасываем
+                if result_turn == turn:
+                    results[snake_id] = (direction, path)
+                    metrics.record(span)
+        return results
+
+    def close(self):
+        for conn in self.connections:
+            conn.send(("stop",))
+        for process in self.processes:
+            process.join(timeout=1)
+            if process.is_alive():
+                process.terminate()
@@ -0,0 +1,74 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+
+# заголовок кадра: время отправки хода (с, time.time()), время запроса (мс),
+# длины сжатых запроса и ответа
+FRAME_HEADER = struct.Struct("<dfII")
+
+
+class Frame:
+    """Один записанный ход: запрос, сырой ответ сервера и тайминги."""
+
+    __slots__ = ("sent_at", "rtt_ms", "request", "response")
+
+    def __init__(self, sent_at, rtt_ms, request, response):
+        self.sent_at = sent_at
+        self.rtt_ms = rtt_ms
+        self.request = request  # байты запроса (json)
+        self.response = response  # байты ответа (json)
+
+
+class Recorder:
+    """
+    Пишет пары запрос/ответ в бинарный лог: кадр — заголовок FRAME_HEADER и два блока zlib.
+    Файл открывается на дозапись, так что несколько запусков складываются в один лог.
+    Сжатие и запись идут в отдельном потоке, ход из-за записи не задерживается.
+    """
+
+    def __init__(self, path, level=1):
+        self.path = path
+        self.level = level
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(path, "ab")
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.write_loop, daemon=True)
+        self.thread.start()
+
+    def record(self, sent_at, rtt_ms, request, response):
+        self.queue.put((sent_at, rtt_ms, request, response))
+
+    def write_loop(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            sent_at, rtt_ms, request, response = item
+            request = zlib.compress(request, self.level)
+            response = zlib.compress(response, self.level)
+            self.file.write(FRAME_HEADER.pack(sent_at, rtt_ms, len(request), len(response)))
+            self.file.write(request)
+            self.file.write(response)
+        self.file.close()
+
+    def close(self):
+        """Дописывает очередь и закрывает файл."""
+        self.queue.put(None)
+        self.thread.join()
+
+    @staticmethod
+    def read(path):
+        """Кадры лога по порядку. Недописанный последний кадр (процесс убит во время записи) пропускается."""
+        with open(path, "rb") as file:
+            while True:
+                header = file.read(FRAME_HEADER.size)
+                if len(header) < FRAME_HEADER.size:
+                    return
+                sent_at, rtt_ms, request_size, response_size = FRAME_HEADER.unpack(header)
+                request = file.read(request_size)
+                response = file.read(response_size)
+                if len(request) < request_size or len(response) < response_size:
+                    return
+                yield Frame(sent_at, rtt_ms, zlib.decompress(request), zlib.decompress(response))
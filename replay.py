@@ -0,0 +1,91 @@
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+import metrics
+from api import loads
+from app import App
+from recorder import Recorder
+from state import GameState
+
+
+def moves_of(request):
+    """{id змеи: направление} из записанного запроса."""
+    return {snake["id"]: snake["direction"] for snake in loads(request).get("snakes", [])}
+
+
+async def replay(path, workers=0, realtime=False, plan_margin_ms=50):
+    """
+    Прогоняет записанную игру через App.process_snakes без сети.
+    Бюджет планирования считается, как в игре: от tickRemainMs и записанного времени запроса.
+    realtime=True — ответы подаются с теми же интервалами, что и в записи, иначе — подряд без пауз.
+    Решения сравниваются с ходами, которые были отправлены в записанной игре.
+    """
+    app = App("", debug=False, mock=True, workers=workers, plan_margin_ms=plan_margin_ms)
+    timings = []
+    late = 0
+    changed = 0
+    compared = 0
+    planned = None
+    first_sent_at = None
+    start = time.time()
+    try:
+        for frame in Recorder.read(path):
+            # запрос кадра — ход, спланированный по ответу прошлого кадра
+            if planned is not None:
+                recorded = moves_of(frame.request)
+                for snake_id, direction in planned.items():
+                    if snake_id in recorded:
+                        compared += 1
+                        changed += recorded[snake_id] != list(direction)
+                planned = None
+
+            if realtime:
+                if first_sent_at is None:
+                    first_sent_at = frame.sent_at
+                delay = frame.sent_at + frame.rtt_ms / 1000 - first_sent_at - (time.time() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            state = GameState.parse(loads(frame.response))
+            app.api.update_rtt(frame.rtt_ms)
+            if not app.scheduler.on_response(state):
+                continue  # в игре на повтор того же тика ход не планировался
+            budget = app.plan_budget_ms()
+            began = time.perf_counter()
+            snakes, _ = app.process_snakes(state)
+            elapsed = (time.perf_counter() - began) * 1000
+            timings.append(elapsed)
+            late += elapsed > budget
+            planned = {snake["id"]: snake["direction"] for snake in snakes}
+    finally:
+        await app.api.close()
+        if app.pool is not None:
+            app.pool.close()
+
+    if not timings:
+        print("no ticks in", path)
+        return timings
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    print(f"ticks: {len(timings)}, planning ms p50 {p50:.1f} p95 {p95:.1f} p99 {p99:.1f} max {max(timings):.1f}")
+    print(f"over budget: {late}, decisions changed: {changed} of {compared}")
+    for name, histogram in sorted(metrics.histograms.items()):
+        print(f"  {name:12} count {histogram.count:6} mean {histogram.sum / histogram.count:8.2f} ms "
+              f"p50 <= {histogram.quantile(0.5)} ms p99 <= {histogram.quantile(0.99)} ms")
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Проигрывание записанной игры через планировщик")
+    parser.add_argument("path", help="файл, записанный App(record_path=...)")
+    parser.add_argument("--workers", type=int, default=0, help="процессов-планировщиков, как WORKERS в main.py")
+    parser.add_argument("--realtime", action="store_true", help="с записанными интервалами между тиками")
+    parser.add_argument("--margin", type=int, default=50, help="plan_margin_ms")
+    args = parser.parse_args()
+    asyncio.run(replay(args.path, args.workers, args.realtime, args.margin))
+
+
+if __name__ == '__main__':
+    main()
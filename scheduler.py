@@ -0,0 +1,120 @@
+import asyncio
+import logging
+import time
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+# с каким запасом ход должен дойти до сервера раньше границы тика, мс
+SEND_MARGIN_MS = 15
+# запас не меньше стольких разбросов времени запроса
+JITTER_FACTOR = 3
+# после хода, применённого тиком позже, запас растёт на LATE_STEP_MS, после хода вовремя — сжимается в LATE_DECAY раз
+LATE_STEP_MS = 10
+LATE_DECAY = 0.98
+# запас не больше такой доли тика
+MAX_MARGIN_SHARE = 0.25
+# длина тика, пока по ответам не видно двух ходов: tickRemainMs первого ответа — лишь остаток тика
+TICK_MS = 1000
+# таймаут запроса не меньше времени запроса плюс столько, мс
+TIMEOUT_MARGIN_MS = 200
+
+
+class TickScheduler:
+    """
+    Расписание тиков по ответам сервера.
+    Ход отправляется так, чтобы дойти до сервера до границы тика: в момент конца тика минус задержка
+    сети в одну сторону (половина сглаженного времени запроса Api) и минус запас на разброс задержки.
+    Если ответ на ход уже с новым тиком, ход опоздал и применится тиком позже — запас увеличивается.
+    Ожидание — таймер asyncio, а не цикл.
+    """
+
+    def __init__(self, api, margin_ms=SEND_MARGIN_MS, jitter_factor=JITTER_FACTOR, tick_ms=TICK_MS):
+        self.api = api
+        self.margin_ms = margin_ms
+        self.jitter_factor = jitter_factor
+        self.late_margin_ms = 0  # добавка к запасу за опоздавшие ходы
+        self.tick_end = None  # конец текущего тика, мс по time.time()
+        self.tick_ms = tick_ms  # длина тика: заданная, а с двух ходов — наибольшая из оценок по ответам
+        self.tick_measured = False
+        self.turn = None
+        self.sent_turn = None  # тик, в который ушёл ход; None — ответ на ход уже разобран
+
+    def latency_ms(self):
+        return self.api.rtt_ms / 2
+
+    def send_margin_ms(self):
+        """Запас до границы тика: не меньше margin_ms и jitter_factor разбросов задержки, плюс поправка за опоздания."""
+        margin = max(self.margin_ms, self.jitter_factor * self.api.rtt_jitter_ms) + self.late_margin_ms
+        if self.tick_ms:
+            margin = min(margin, self.tick_ms * MAX_MARGIN_SHARE)
+        return margin
+
+    def on_response(self, game_state):
+        """
+        Запоминает конец тика из ответа. tickRemainMs посчитан сервером в момент ответа,
+        а ответ шёл к нам ещё latency_ms. Возвращает False, если тик с прошлого ответа не сменился.
+        """
+        if self.sent_turn is not None:
+            self.on_move_applied(game_state.turn > self.sent_turn)
+            self.sent_turn = None
+        tick_end = time.time() * 1000 + game_state.tick_remain_ms - self.latency_ms()
+        # длина тика: по сдвигу конца тика между ходами. Первый ответ может прийти в самом конце тика,
+        # поэтому до второго хода остаётся заданная длина
+        if self.turn is not None and game_state.turn > self.turn:
+            measured = (tick_end - self.tick_end) / (game_state.turn - self.turn)
+            self.tick_ms = max(self.tick_ms, measured) if self.tick_measured else measured
+            self.tick_measured = True
+        self.tick_ms = max(self.tick_ms, game_state.tick_remain_ms)
+        self.tick_end = tick_end
+        advanced = self.turn is None or game_state.turn != self.turn
+        self.turn = game_state.turn
+        return advanced
+
+    def on_move_applied(self, late):
+        """
+        Подстраивает запас по ответу на ход: сервер отвечает сразу, поэтому ответ с тем же тиком значит,
+        что ход дошёл до границы, а с новым — что ход применится только в следующем тике.
+        """
+        if late:
+            self.late_margin_ms += LATE_STEP_MS
+            metrics.count("late_arrivals")
+            log.info("move arrived after the tick boundary, send margin is now %.0fms", self.send_margin_ms())
+        else:
+            self.late_margin_ms *= LATE_DECAY
+
+    def send_time(self):
+        """Момент отправки хода, мс по time.time()."""
+        return self.tick_end - self.latency_ms() - self.send_margin_ms()
+
+    def time_to_send_ms(self):
+        return self.send_time() - time.time() * 1000
+
+    def time_to_tick_end_ms(self):
+        return self.tick_end - time.time() * 1000
+
+    def request_timeout_ms(self):
+        """
+        Ответ, пришедший позже, чем через тик после отправки, уже бесполезен. Но таймаут не короче времени запроса
+        с запасом: иначе при длинном запросе не дойдёт ни один ответ и оценка тика не обновится никогда.
+        """
+        return max(self.tick_ms, self.api.rtt_ms + TIMEOUT_MARGIN_MS)
+
+    def is_new_tick(self):
+        return time.time() * 1000 > self.tick_end
+
+    async def wait_send_time(self):
+        """Спит до момента отправки хода. Если планирование не успело, ход уходит сразу."""
+        self.sent_turn = self.turn
+        delay = self.time_to_send_ms()
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+        else:
+            metrics.count("late_moves")
+            log.warning("late move: %.0fms after send time", -delay)
+
+    async def wait_tick_end(self):
+        delay = self.time_to_tick_end_ms()
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
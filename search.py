@@ -0,0 +1,210 @@
+import time
+from heapq import heappush, heappop
+
+import numpy as np
+
+# g помещается в младшие разряды приоритета; длиннее пути на карте не бывает
+G_LIMIT = 1 << 16
+# по сколько клеток слоя раскрывает bidirectional_search между проверками часов
+FRONTIER_CHUNK = 4096
+
+
+class SearchResult:
+    """Результат поиска пути."""
+
+    def __init__(self, path, expansions, found, exhausted=False):
+        # список координат от старта; если цель не найдена — частичный путь к лучшей раскрытой клетке
+        self.path = path
+        self.expansions = expansions  # сколько клеток раскрыто
+        self.found = found  # путь доходит до цели
+        self.exhausted = exhausted  # раскрыта вся достижимая область, цель недостижима
+        self.waypoint = None  # hpa: промежуточный вход, к которому уточнялся путь (плоский индекс)
+
+    def first_step(self):
+        """Направление первого шага пути или None."""
+        if len(self.path) < 2:
+            return None
+        return tuple(self.path[1][i] - self.path[0][i] for i in range(3))
+
+
+def reconstruct(world, parents, cell):
+    """Восстанавливает путь по указателям на родителя, только когда он действительно нужен."""
+    path = []
+    while cell != -1:
+        path.append(world.decode(cell))
+        cell = parents[cell]
+    path.reverse()
+    return path
+
+
+def a_star(world, start, target, max_iterations=1000000, deadline=None, check_every=1024):
+    """
+    A* по плоской сетке мира с манхэттенской эвристикой.
+    Клетки — целые числа (плоские индексы), соседи — заранее посчитанные сдвиги индекса, путь не копируется:
+    хранится только родитель каждой клетки. Элемент кучи — одно целое число, в котором упакованы
+    f, g и клетка, поэтому на раскрытие не создаются кортежи и списки.
+    Целевая клетка считается достижимой, даже если сама помечена препятствием (еда в опасной зоне).
+    Клетка тела змеи проходима, если к шагу g, на котором в неё входят, хвост из неё уже уйдёт (world.vacate).
+    Поиск работает в режиме anytime: часы (time.perf_counter() против deadline) смотрятся раз
+    в check_every раскрытий, а при нехватке времени или итераций возвращается частичный путь
+    к раскрытой клетке, ближайшей к цели по эвристике.
+    """
+    blocked = world.blocked_flat
+    vacate = world.vacate_flat
+    neighbours = world.neighbours
+    stride_x, stride_y = world.strides[0], world.strides[1]
+    size = len(blocked)
+    source = world.encode(start)
+    goal = world.encode(target)
+    gx, rest = divmod(goal, stride_x)
+    gy, gz = divmod(rest, stride_y)
+
+    g_cost = {source: 0}
+    parents = {source: -1}
+    sx, rest = divmod(source, stride_x)
+    sy, sz = divmod(rest, stride_y)
+    h = abs(sx - gx) + abs(sy - gy) + abs(sz - gz)
+    # приоритет: f, при равенстве — больший g (глубже к цели)
+    heap = [(h * G_LIMIT + G_LIMIT - 1) * size + source]
+    expansions = 0
+    best_cell, best_h = source, h
+
+    while heap:
+        entry = heappop(heap)
+        key, cell = divmod(entry, size)
+        f, g = divmod(key, G_LIMIT)
+        g = G_LIMIT - 1 - g
+        if g > g_cost[cell]:
+            continue  # устаревшая запись
+        if cell == goal:
+            return SearchResult(reconstruct(world, parents, cell), expansions, True)
+        if f - g < best_h:
+            best_cell, best_h = cell, f - g
+        expansions += 1
+        if expansions > max_iterations:
+            break
+        if deadline is not None and expansions % check_every == 0 and time.perf_counter() > deadline:
+            break
+        g += 1
+        for step in neighbours:
+            next_cell = cell + step
+            if next_cell != goal and blocked[next_cell] and not 0 < vacate[next_cell] < g:
+                continue
+            if g >= g_cost.get(next_cell, G_LIMIT):
+                continue
+            g_cost[next_cell] = g
+            parents[next_cell] = cell
+            x, rest = divmod(next_cell, stride_x)
+            y, z = divmod(rest, stride_y)
+            f = g + abs(x - gx) + abs(y - gy) + abs(z - gz)
+            heappush(heap, (f * G_LIMIT + G_LIMIT - 1 - g) * size + next_cell)
+    else:
+        return SearchResult([], expansions, False, exhausted=True)
+    return SearchResult(reconstruct(world, parents, best_cell), expansions, False)
+
+
+def mark(bits, cells):
+    """Ставит биты клеток в битовой маске над всем объёмом карты (бит на клетку)."""
+    np.bitwise_or.at(bits, cells >> 3, (1 << (cells & 7)).astype(np.uint8))
+
+
+def is_marked(bits, cells):
+    return (bits[cells >> 3] >> (cells & 7)) & 1 == 1
+
+
+def walk_layers(world, layers, cell):
+    """
+    Путь от начала обхода до клетки из последнего (или любого) слоя: на каждом шаге назад ищется сосед
+    в предыдущем слое. Слои отсортированы, поиск — бинарный.
+    :return: плоские индексы от начала обхода до cell
+    """
+    depth = next(depth for depth in range(len(layers)) if in_layer(layers[depth], cell))
+    path = [cell]
+    for layer in reversed(layers[:depth]):
+        cell = next(cell + step for step in world.neighbours if in_layer(layer, cell + step))
+        path.append(cell)
+    path.reverse()
+    return path
+
+
+def in_layer(layer, cell):
+    position = np.searchsorted(layer, cell)
+    return position < len(layer) and layer[position] == cell
+
+
+def manhattan_to(world, cells, cell):
+    """Манхэттенские расстояния от плоских индексов cells до клетки cell."""
+    x, rest = np.divmod(cells, world.strides[0])
+    y, z = np.divmod(rest, world.strides[1])
+    cx, rest = divmod(cell, world.strides[0])
+    cy, cz = divmod(rest, world.strides[1])
+    return np.abs(x - cx) + np.abs(y - cy) + np.abs(z - cz)
+
+
+def bidirectional_search(world, start, target, max_iterations=1000000, deadline=None, chunk=FRONTIER_CHUNK):
+    """
+    Обход в ширину навстречу от старта и от цели, пока фронты не встретятся. Каждый раз расширяется меньший фронт,
+    поэтому если цель заперта в маленьком кармане, обратный фронт быстро кончается и недостижимость видна сразу,
+    без обхода всей области вокруг старта. Шаг обхода — векторные операции над слоем; закрытые множества —
+    битовые маски над объёмом карты (бит на клетку), а не множества python.
+    Стоимость шага и проходимость те же, что в a_star: цель достижима, даже если сама помечена препятствием,
+    а тело змеи проходимо, если хвост уйдёт раньше, чем в клетку войдут. Прямой обход знает шаг входа точно,
+    обратный — только его нижнюю оценку, манхэттенское расстояние от старта, поэтому он осторожнее.
+    Слой раскрывается кусками по chunk клеток, и часы (deadline, time.perf_counter()) смотрятся после каждого
+    куска, так что один широкий слой не съедает весь тик. Если не хватило времени или max_iterations,
+    возвращается путь к клетке прямого обхода, ближайшей к цели, как частичный путь a_star.
+    """
+    blocked = world.blocked.reshape(-1)
+    vacate = world.vacate.reshape(-1)
+    steps = np.array(world.neighbours)
+    source = world.encode(start)
+    goal = world.encode(target)
+    if source == goal:
+        return SearchResult([world.decode(source)], 0, True)
+    closed = [np.zeros((blocked.size + 7) // 8, dtype=np.uint8) for _ in range(2)]
+    # слои обхода: слой d — отсортированные клетки на расстоянии d от старта (0) или от цели (1)
+    layers = [[np.array([source])], [np.array([goal])]]
+    mark(closed[0], layers[0][0])
+    mark(closed[1], layers[1][0])
+    expansions = 0
+    out_of_time = False
+    while not out_of_time:
+        side = 0 if len(layers[0][-1]) <= len(layers[1][-1]) else 1
+        frontier = layers[side][-1]
+        depth = len(layers[side])
+        found = []
+        for begin in range(0, len(frontier), chunk):
+            part = frontier[begin:begin + chunk]
+            expansions += len(part)
+            cells = (part[:, None] + steps).reshape(-1)
+            passable = (blocked[cells] == 0) | (cells == goal)
+            # тело змеи: проходимо, если хвост уйдёт раньше шага входа (для обратного обхода — его оценки снизу)
+            body = ~passable & (vacate[cells] > 0)
+            if body.any():
+                entry = depth if side == 0 else manhattan_to(world, cells[body], source)
+                passable[body] = vacate[cells[body]] < entry
+            cells = np.unique(cells[passable & ~is_marked(closed[side], cells)])
+            mark(closed[side], cells)
+            found.append(cells)
+            if expansions > max_iterations or (deadline is not None and time.perf_counter() > deadline):
+                out_of_time = True
+                break
+        cells = np.concatenate(found)
+        if not len(cells):
+            if out_of_time:
+                break
+            # один из фронтов кончился: между стартом и целью прохода нет
+            return SearchResult([], expansions, False, exhausted=True)
+        cells.sort()
+        layers[side].append(cells)
+        meet = cells[is_marked(closed[1 - side], cells)]
+        if len(meet):
+            # все клетки встречи на одном расстоянии от этой стороны: берём ближайшую к другой
+            other = layers[1 - side]
+            cell = next(hit for layer in other for hit in meet if in_layer(layer, hit))
+            path = walk_layers(world, layers[0], cell) + walk_layers(world, layers[1], cell)[-2::-1]
+            return SearchResult([world.decode(cell) for cell in path], expansions, True)
+    # частичный путь: к клетке прямого обхода, ближайшей к цели по манхэттену
+    reached = np.concatenate(layers[0])
+    cell = int(reached[np.argmin(manhattan_to(world, reached, goal))])
+    return SearchResult([world.decode(cell) for cell in walk_layers(world, layers[0], cell)], expansions, False)
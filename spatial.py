@@ -0,0 +1,111 @@
+class SpatialIndex:
+    """
+    Равномерная сетка корзин над клетками карты для быстрых запросов «в радиусе» и «k ближайших».
+    Каждая корзина — куб со стороной bucket_size; расстояния сравниваются в квадратах, без sqrt.
+    """
+
+    def __init__(self, bucket_size=8):
+        self.bucket_size = bucket_size
+        self.buckets = {}  # (bx, by, bz) -> {клетка: значение}
+        self.items = {}  # клетка -> значение
+        # границы занятых корзин; при удалении не сужаются, поэтому всегда покрывают все клетки
+        self.low = None
+        self.high = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, position):
+        return tuple(position) in self.items
+
+    def bucket_of(self, position):
+        size = self.bucket_size
+        return position[0] // size, position[1] // size, position[2] // size
+
+    def get(self, position, default=None):
+        return self.items.get(tuple(position), default)
+
+    def insert(self, position, value):
+        """Добавляет клетку или обновляет её значение."""
+        position = tuple(position)
+        self.items[position] = value
+        key = self.bucket_of(position)
+        self.buckets.setdefault(key, {})[position] = value
+        if self.low is None:
+            self.low, self.high = key, key
+        else:
+            self.low = tuple(map(min, self.low, key))
+            self.high = tuple(map(max, self.high, key))
+
+    def remove(self, position):
+        """Удаляет клетку, если она есть в индексе."""
+        position = tuple(position)
+        if self.items.pop(position, None) is None:
+            return
+        key = self.bucket_of(position)
+        bucket = self.buckets[key]
+        del bucket[position]
+        if not bucket:
+            del self.buckets[key]
+
+    def clear(self):
+        self.buckets = {}
+        self.items = {}
+        self.low = None
+        self.high = None
+
+    def within_radius(self, position, radius):
+        """Все клетки не дальше radius: список (клетка, значение, квадрат расстояния)."""
+        x, y, z = position
+        limit = radius * radius
+        size = self.bucket_size
+        found = []
+        for bx in range(int(x - radius) // size, int(x + radius) // size + 1):
+            for by in range(int(y - radius) // size, int(y + radius) // size + 1):
+                for bz in range(int(z - radius) // size, int(z + radius) // size + 1):
+                    bucket = self.buckets.get((bx, by, bz))
+                    if not bucket:
+                        continue
+                    for cell, value in bucket.items():
+                        distance = (cell[0] - x) ** 2 + (cell[1] - y) ** 2 + (cell[2] - z) ** 2
+                        if distance <= limit:
+                            found.append((cell, value, distance))
+        return found
+
+    def nearest(self, position, k=1):
+        """k ближайших клеток: список (клетка, значение, квадрат расстояния) по возрастанию расстояния."""
+        if not self.items:
+            return []
+        x, y, z = position
+        cx, cy, cz = self.bucket_of(position)
+        size = self.bucket_size
+        # дальше самой дальней корзины искать бессмысленно
+        center = (cx, cy, cz)
+        max_ring = max(max(c - low, high - c) for c, low, high in zip(center, self.low, self.high))
+        found = []
+        for ring in range(max_ring + 1):
+            for bx in range(cx - ring, cx + ring + 1):
+                for by in range(cy - ring, cy + ring + 1):
+                    # обходим только оболочку куба корзин: внутри неё всё уже просмотрено
+                    if ring and abs(bx - cx) != ring and abs(by - cy) != ring:
+                        layers = (cz - ring, cz + ring)
+                    else:
+                        layers = range(cz - ring, cz + ring + 1)
+                    for bz in layers:
+                        bucket = self.buckets.get((bx, by, bz))
+                        if not bucket:
+                            continue
+                        for cell, value in bucket.items():
+                            distance = (cell[0] - x) ** 2 + (cell[1] - y) ** 2 + (cell[2] - z) ** 2
+                            found.append((cell, value, distance))
+            if len(found) >= k:
+                found.sort(key=lambda item: item[2])
+                # ближайшая непросмотренная клетка не ближе расстояния до грани просмотренного куба
+                bound = min(
+                    min(p - (c - ring) * size + 1, (c + ring + 1) * size - p)
+                    for p, c in zip(position, center)
+                )
+                if found[k - 1][2] <= bound * bound:
+                    return found[:k]
+        found.sort(key=lambda item: item[2])
+        return found[:k]
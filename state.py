@@ -0,0 +1,107 @@
+from itertools import chain
+
+import numpy as np
+
+COORD_DTYPE = np.int16
+
+
+def coords_array(cells, count=None):
+    """Список [[x, y, z], ...] в компактный массив int16 (n, 3) за один проход."""
+    if count is None:
+        count = len(cells)
+    if count == 0:
+        return np.empty((0, 3), dtype=COORD_DTYPE)
+    return np.fromiter(chain.from_iterable(cells), dtype=COORD_DTYPE, count=count * 3).reshape(count, 3)
+
+
+class Snake:
+    """Наша змея из ответа сервера."""
+
+    __slots__ = ("id", "direction", "old_direction", "geometry", "death_count", "status", "revive_remain_ms")
+
+    def __init__(self, data):
+        self.id = data["id"]
+        self.direction = data.get("direction")
+        self.old_direction = data.get("oldDirection")
+        self.geometry = coords_array(data.get("geometry") or [])
+        self.death_count = data.get("deathCount", 0)
+        self.status = data.get("status")
+        self.revive_remain_ms = data.get("reviveRemainMs", 0)
+
+    def is_alive(self):
+        return len(self.geometry) > 0
+
+    def head(self):
+        return self.geometry[0].tolist()
+
+    def __repr__(self):
+        return f"Snake({self.id}, {self.status}, length={len(self.geometry)})"
+
+
+class GameState:
+    """
+    Ответ сервера в колоночном виде: координаты — массивы int16, числа — плоские массивы.
+    Сегменты всех врагов лежат одним массивом, enemy_offsets[i]:enemy_offsets[i + 1] — сегменты i-го врага.
+    """
+
+    __slots__ = (
+        "map_size", "name", "points", "turn", "tick_remain_ms", "revive_timeout_sec", "errors",
+        "fences", "snakes", "enemy_segments", "enemy_offsets", "enemy_status", "enemy_kills",
+        "food_coords", "food_points", "food_types", "golden", "suspicious",
+    )
+
+    @staticmethod
+    def parse(res):
+        """Разбирает ответ сервера (результат json) за один проход по каждому списку."""
+        state = GameState()
+        state.map_size = tuple(res["mapSize"])
+        state.name = res.get("name")
+        state.points = res.get("points", 0)
+        state.turn = res.get("turn", 0)
+        state.tick_remain_ms = res.get("tickRemainMs", 0)
+        state.revive_timeout_sec = res.get("reviveTimeoutSec", 0)
+        state.errors = res.get("errors", [])
+
+        state.fences = coords_array(res["fences"])
+        state.snakes = [Snake(snake) for snake in res["snakes"]]
+
+        enemies = res["enemies"]
+        lengths = np.fromiter((len(enemy.get("geometry") or ()) for enemy in enemies), dtype=np.int32,
+                              count=len(enemies))
+        state.enemy_offsets = np.zeros(len(enemies) + 1, dtype=np.int32)
+        np.cumsum(lengths, out=state.enemy_offsets[1:])
+        state.enemy_segments = coords_array(
+            chain.from_iterable(enemy.get("geometry") or () for enemy in enemies), int(state.enemy_offsets[-1])
+        )
+        state.enemy_status = [enemy.get("status") for enemy in enemies]
+        state.enemy_kills = [enemy.get("kills", 0) for enemy in enemies]
+
+        food = res["food"]
+        state.food_coords = coords_array((item["c"] for item in food), len(food))
+        state.food_points = np.fromiter((item["points"] for item in food), dtype=np.int32, count=len(food))
+        state.food_types = np.fromiter((item.get("type", 0) for item in food), dtype=np.int8, count=len(food))
+        special = res.get("specialFood") or {}
+        state.golden = coords_array(special.get("golden") or [])
+        state.suspicious = coords_array(special.get("suspicious") or [])
+        return state
+
+    def enemy_heads(self):
+        """Головы врагов, у которых есть тело."""
+        starts = self.enemy_offsets[:-1]
+        return self.enemy_segments[starts[self.enemy_offsets[1:] > starts]]
+
+    def enemy_geometry(self, i):
+        return self.enemy_segments[self.enemy_offsets[i]:self.enemy_offsets[i + 1]]
+
+    def enemy_count(self):
+        return len(self.enemy_offsets) - 1
+
+    def own_bodies(self):
+        """Сегменты наших змей без голов."""
+        bodies = [snake.geometry[1:] for snake in self.snakes if snake.is_alive()]
+        if not bodies:
+            return np.empty((0, 3), dtype=COORD_DTYPE)
+        return np.concatenate(bodies)
+
+    def max_food_price(self):
+        return int(self.food_points.max()) if len(self.food_points) else 0
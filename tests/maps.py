@@ -0,0 +1,50 @@
+"""Маленькие карты и эталонные обходы для тестов планировщика."""
+from collections import deque
+
+import numpy as np
+
+import bench
+from state import GameState
+from world import World
+
+
+def synthetic_world(map_size=(20, 20, 10), fence_density=0.2, food_count=30, snakes=3, enemies=0, seed=0):
+    """Мир по случайному ответу сервера (bench.synthetic_response): заборы, еда и наши змеи из одной клетки."""
+    return World.from_state(GameState.parse(
+        bench.synthetic_response(map_size, fence_density, food_count, 1, snakes, enemies, seed)
+    ))
+
+
+def add_food(world, cells, values):
+    """Еда на карте так же, как её кладёт World.build: ценность клеток и пространственный индекс."""
+    world.set_value(np.array(cells), np.array(values))
+    for cell, value in zip(cells, values):
+        world.food_index.insert(tuple(cell), value)
+
+
+def distances(world, start):
+    """Эталонные расстояния обхода в ширину по свободным клеткам: {плоский индекс: шагов}."""
+    source = world.encode(start)
+    found = {source: 0}
+    queue = deque([source])
+    while queue:
+        cell = queue.popleft()
+        for step in world.neighbours:
+            next_cell = cell + step
+            if next_cell not in found and not world.blocked_flat[next_cell]:
+                found[next_cell] = found[cell] + 1
+                queue.append(next_cell)
+    return found
+
+
+def free_cells(world):
+    return [world.decode(cell) for cell in (world.blocked.reshape(-1) == 0).nonzero()[0].tolist()]
+
+
+def assert_valid_path(world, path, start, target):
+    """Путь от start до target по соседним клеткам, промежуточные клетки свободны."""
+    assert list(path[0]) == list(start) and list(path[-1]) == list(target)
+    for a, b in zip(path, path[1:]):
+        assert sum(abs(a[i] - b[i]) for i in range(3)) == 1
+    for cell in path[1:-1]:
+        assert not world.is_blocked(cell)
@@ -0,0 +1,27 @@
+import numpy as np
+
+from cubes import Cubes
+from world import DIRECTIONS, World
+
+
+def test_boxed_in_head_still_gets_a_direction():
+    world = World((5, 5, 5))
+    head = [2, 2, 2]
+    world.add_cost(np.array([[head[i] + direction[i] for i in range(3)] for direction in DIRECTIONS]), -100)
+    direction, path = Cubes.find_next_direction_to_center(world, head)
+    assert tuple(direction) in DIRECTIONS
+    assert path[0] == head
+
+
+def test_centering_without_food_moves_towards_center():
+    world = World((9, 9, 9))
+    direction, path = Cubes.find_next_direction_to_center(world, [0, 4, 4])
+    assert tuple(direction) == (1, 0, 0)
+
+
+def test_waypoint_of_eaten_goal_is_dropped():
+    world = World((9, 9, 9))
+    eaten, far = world.encode([8, 8, 8]), world.encode([0, 0, 8])
+    waypoints = {eaten: far}
+    Cubes.find_next_direction_to_center(world, [0, 4, 4], waypoints=waypoints)
+    assert eaten not in waypoints
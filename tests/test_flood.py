@@ -0,0 +1,40 @@
+import numpy as np
+
+from flood import flood_fill
+from maps import assert_valid_path, distances, free_cells, synthetic_world
+from world import World
+
+
+def test_targets_have_true_distances():
+    world = synthetic_world(seed=3)
+    cells = free_cells(world)
+    head = cells[len(cells) // 2]
+    reference = distances(world, head)
+    flood = flood_fill(world, head, max_depth=200)
+    assert flood.complete
+    assert flood.targets
+    for cell, steps, price in flood.targets:
+        assert steps == reference[cell]
+        assert price == world.value_flat[cell]
+        assert_valid_path(world, flood.path_to(cell), head, world.decode(cell))
+    reachable = {cell for cell in reference if world.value_flat[cell] > 0 and reference[cell] > 0}
+    assert {cell for cell, _, _ in flood.targets} == reachable
+
+
+def test_best_target_is_best_price_per_step():
+    world = World((10, 1, 1))
+    world.set_value(np.array([[2, 0, 0], [8, 0, 0]]), np.array([10, 60]))
+    cell, steps, price = flood_fill(world, [0, 0, 0]).best_target()
+    assert world.decode(cell) == [8, 0, 0] and steps == 8 and price == 60
+
+
+def test_body_passable_only_after_tail_leaves():
+    # коридор 1x1: впереди тело, которое освободится через 3 тика
+    world = World((6, 1, 1))
+    body = world.add_cost(np.array([[2, 0, 0]]), -100)
+    world.set_value(np.array([[4, 0, 0]]), np.array([10]))
+    world.set_vacate(body, [3])
+    # в клетку тела входим на шаге 2 — рано
+    assert flood_fill(world, [0, 0, 0]).best_target() is None
+    world.set_vacate(body, [1])
+    assert flood_fill(world, [0, 0, 0]).best_target()[1] == 4
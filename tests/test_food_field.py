@@ -0,0 +1,46 @@
+from food_field import plan_team
+from maps import add_food, free_cells, synthetic_world
+from world import World
+
+
+def assert_plans(world, heads, plans, taken=()):
+    targets = [target for _, _, target in plans.values()]
+    assert len(targets) == len(set(targets))
+    assert not {tuple(world.decode(target)) for target in targets} & set(taken)
+    for snake_id, (cell, path, target) in plans.items():
+        assert path[0] == heads[snake_id] and path[1] == cell and path[-1] == target
+        assert world.value_flat[target] > 0
+        for a, b in zip(path, path[1:]):
+            assert b - a in world.neighbours
+        assert not any(world.blocked_flat[step] for step in path[1:-1])
+
+
+def test_snakes_next_to_one_food_get_different_targets():
+    world = World((12, 12, 1))
+    add_food(world, [[6, 6, 0], [0, 11, 0], [11, 0, 0]], [40, 5, 5])
+    # три змеи вокруг самой дорогой еды
+    heads = {"a": world.encode([5, 6, 0]), "b": world.encode([7, 6, 0]), "c": world.encode([6, 5, 0])}
+    plans = plan_team(world, heads)
+    assert_plans(world, heads, plans)
+    assert len(plans) == 3
+    assert sum(target == world.encode([6, 6, 0]) for _, _, target in plans.values()) == 1
+
+
+def test_plan_team_targets_are_unique_on_random_maps():
+    for seed in range(4):
+        world = synthetic_world(fence_density=0.15, food_count=12, seed=seed)
+        cells = free_cells(world)
+        heads = {i: world.encode(cells[i * len(cells) // 8]) for i in range(8)}
+        taken = {tuple(cell) for cell in list(world.food_index.items)[:3]}
+        plans = plan_team(world, heads, taken=taken)
+        assert plans
+        assert_plans(world, heads, plans, taken)
+
+
+def test_more_snakes_than_food():
+    world = World((10, 10, 1))
+    add_food(world, [[5, 5, 0]], [10])
+    heads = {i: world.encode([i, 0, 0]) for i in range(4)}
+    plans = plan_team(world, heads)
+    assert len(plans) == 1
+    assert_plans(world, heads, plans)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from hpa import chunk_distances, hierarchical_search
+from maps import assert_valid_path, distances, synthetic_world
+from search import a_star
+from world import World
+
+
+def test_chunk_distances_match_bfs():
+    world = synthetic_world(map_size=(8, 8, 8), fence_density=0.25, seed=4)
+    free = world.blocked[1:-1, 1:-1, 1:-1] == 0
+    cells = [tuple(cell) for cell in np.argwhere(free)[::7].tolist()]
+    distance = chunk_distances(free, cells, cells)
+    for i, source in enumerate(cells):
+        reference = distances(world, source)
+        for j, target in enumerate(cells):
+            assert distance[i, j] == reference.get(world.encode(target), -1)
+
+
+def serpentine():
+    """Стены поперёк оси x с проходом попеременно у разных краёв: путь к цели втрое длиннее манхэттенского."""
+    world = World((72, 40, 8))
+    walls = []
+    for i, x in enumerate(range(12, 72, 12)):
+        y, z = np.meshgrid(np.arange(40), np.arange(8), indexing="ij")
+        hole = (y < 3) if i % 2 else (y > 36)
+        walls.append(np.stack([np.full(int((~hole).sum()), x), y[~hole], z[~hole]], axis=1))
+    fences = np.concatenate(walls)
+    world.add_cost(fences, -100)
+    world.set_fences(world.unique_index(fences))
+    return world
+
+
+def test_walk_along_partial_paths_reaches_far_target():
+    world = serpentine()
+    start, target = [2, 20, 4], [70, 20, 4]
+    shortest = len(a_star(world, start, target).path) - 1
+    position, steps, waypoint = start, 0, None
+    while position != target and steps < 2 * shortest:
+        result = hierarchical_search(world, position, target, waypoint=waypoint)
+        waypoint = result.waypoint
+        assert result.path and not result.exhausted
+        assert_valid_path(world, result.path, position, result.path[-1])
+        position = result.path[1]
+        steps += 1
+    assert position == target
+    assert steps <= 1.5 * shortest
+
+
+def test_target_cut_off_by_fences_is_exhausted():
+    world = serpentine()
+    box = np.array([[x, y, z] for x in range(64, 69) for y in range(16, 21) for z in range(2, 7)
+                    if x in (64, 68) or y in (16, 20) or z in (2, 6)])
+    world.add_cost(box, -100)
+    world.set_fences(np.union1d(world.fences, world.unique_index(box)))
+    result = hierarchical_search(world, [2, 20, 4], [66, 18, 4])
+    assert not result.found and result.exhausted
@@ -0,0 +1,67 @@
+import numpy as np
+
+from hpa import ChunkGraph, StoredChunkGraph, hierarchical_search
+from map_cache import MapCache
+from maps import synthetic_world
+
+
+def small_world(seed=0):
+    return synthetic_world(map_size=(40, 40, 20), fence_density=0.15, seed=seed)
+
+
+def test_save_and_load_round_trip(tmp_path):
+    world = small_world()
+    cache = MapCache(str(tmp_path))
+    assert cache.load(world) is None
+    assert cache.save(world)
+    built = world.chunks
+    assert isinstance(built, ChunkGraph) and len(built.edges) == int(np.prod(built.counts))
+
+    stored = cache.load(small_world())
+    assert isinstance(stored, StoredChunkGraph)
+    assert isinstance(stored.arrays["edge_targets"], np.memmap)
+    assert np.array_equal(stored.static, built.static)
+    for chunk in np.ndindex(*built.counts):
+        entrances = built.entrances_of(chunk)
+        assert stored.entrances_of(chunk) == entrances
+        for cell in entrances:
+            assert sorted(map(tuple, stored.edges_of(cell))) == sorted(built.edges_of(cell))
+            assert sorted(stored.links_of(cell)) == sorted(built.links_of(cell))
+
+
+def test_world_uses_cached_graph(tmp_path):
+    cache = MapCache(str(tmp_path))
+    cache.save(small_world())
+    world = small_world()
+    world.map_cache = cache
+    assert isinstance(world.chunk_graph(), StoredChunkGraph)
+    reference = small_world()
+    start, target = [0, 0, 0], [39, 39, 19]
+    for position in (start, [20, 5, 10]):
+        if world.is_blocked(position) or world.is_blocked(target):
+            continue
+        expected = hierarchical_search(reference, position, target)
+        assert hierarchical_search(world, position, target).path == expected.path
+    # граф с диска не пересохраняется
+    assert not cache.save(world)
+
+
+def test_key_depends_on_fences(tmp_path):
+    cache = MapCache(str(tmp_path))
+    cache.save(small_world())
+    other = small_world(seed=1)
+    assert cache.key(other) != cache.key(small_world())
+    assert cache.load(other) is None
+    assert cache.build_in_background(small_world()) is None
+
+
+def test_build_in_background(tmp_path):
+    cache = MapCache(str(tmp_path))
+    world = small_world()
+    process = cache.build_in_background(world)
+    assert process is not None
+    # второй раз для тех же заборов процесс не запускается
+    assert cache.build_in_background(world) is None
+    process.join(60)
+    assert process.exitcode == 0
+    assert isinstance(cache.load(small_world()), StoredChunkGraph)
@@ -0,0 +1,69 @@
+import numpy as np
+
+from maps import add_food
+from plan_cache import PlanCache
+from world import World
+
+
+def corridor():
+    world = World((12, 1, 1))
+    add_food(world, [[8, 0, 0]], [20])
+    path = [[x, 0, 0] for x in range(2, 9)]
+    return world, path
+
+
+def test_follow_shifts_path_by_one_step():
+    world, path = corridor()
+    cache = PlanCache()
+    cache.store("s", path, world)
+    # змея ещё не сходила: путь от текущей головы
+    assert cache.follow("s", [2, 0, 0], world) == ((1, 0, 0), path)
+    direction, rest = cache.follow("s", [3, 0, 0], world)
+    assert direction == (1, 0, 0) and rest == path[1:]
+    assert cache.targets() == {(8, 0, 0)}
+
+
+def test_plan_is_dropped_when_invalid():
+    world, path = corridor()
+    cache = PlanCache()
+    cache.store("s", path, world)
+    assert cache.follow("s", [5, 0, 0], world) is None  # сошла с пути
+    cache.store("s", path, world)
+    world.add_cost(np.array([[6, 0, 0]]), -100)
+    assert cache.follow("s", [3, 0, 0], world) is None  # путь перекрыт
+    world.add_cost(np.array([[6, 0, 0]]), 100)
+    cache.store("s", path, world)
+    world.set_value(np.array([[8, 0, 0]]), 0)
+    assert cache.follow("s", [3, 0, 0], world) is None  # еду съели
+    assert cache.targets() == set()
+
+
+def test_path_through_vacating_body_stays_valid():
+    world, path = corridor()
+    body = world.add_cost(np.array([[5, 0, 0]]), -100)
+    cache = PlanCache()
+    world.set_vacate(body, [2])
+    cache.store("s", path, world)
+    # клетка тела — третий шаг пути, хвост уйдёт через 2 тика
+    assert cache.follow("s", [2, 0, 0], world) is not None
+    world.set_vacate(body, [3])
+    assert cache.follow("s", [2, 0, 0], world) is None
+
+
+def test_better_food_nearby_forces_replanning():
+    world, path = corridor()
+    cache = PlanCache()
+    cache.store("s", path, world)
+    add_food(world, [[1, 0, 0]], [500])
+    assert cache.follow("s", [3, 0, 0], world) is None
+
+
+def test_only_food_paths_are_stored_and_dead_snakes_forgotten():
+    world, path = corridor()
+    cache = PlanCache()
+    cache.store("s", path[:3], world)
+    assert cache.follow("s", [2, 0, 0], world) is None
+    cache.store("s", path, world)
+    cache.store("t", path, world)
+    cache.retain({"t"})
+    assert set(cache.plans) == {"t"}
@@ -0,0 +1,98 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import scheduler
+from scheduler import TickScheduler, LATE_STEP_MS, SEND_MARGIN_MS, TICK_MS, TIMEOUT_MARGIN_MS
+
+
+class Clock:
+    def __init__(self, now_ms):
+        self.now_ms = now_ms
+
+    def time(self):
+        return self.now_ms / 1000
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1_000_000)
+    monkeypatch.setattr(scheduler.time, "time", clock.time)
+    return clock
+
+
+def response(turn, tick_remain_ms):
+    return SimpleNamespace(turn=turn, tick_remain_ms=tick_remain_ms)
+
+
+def test_send_time_arithmetic(clock):
+    api = SimpleNamespace(rtt_ms=40, rtt_jitter_ms=0)
+    ticks = TickScheduler(api)
+    assert ticks.on_response(response(10, 900))
+    # ответ шёл к нам ещё половину времени запроса
+    assert ticks.tick_end == pytest.approx(1_000_000 + 900 - 20)
+    assert ticks.send_margin_ms() == SEND_MARGIN_MS
+    assert ticks.send_time() == pytest.approx(ticks.tick_end - 20 - SEND_MARGIN_MS)
+    clock.now_ms += 100
+    assert ticks.time_to_send_ms() == pytest.approx(900 - 20 - 100 - 20 - SEND_MARGIN_MS)
+    assert ticks.time_to_tick_end_ms() == pytest.approx(900 - 20 - 100)
+
+
+def test_tick_length_and_same_turn(clock):
+    api = SimpleNamespace(rtt_ms=0, rtt_jitter_ms=0)
+    ticks = TickScheduler(api, tick_ms=500)
+    ticks.on_response(response(1, 300))
+    assert ticks.tick_ms == 500
+    clock.now_ms += 200
+    assert not ticks.on_response(response(1, 100))
+    clock.now_ms += 150
+    assert ticks.on_response(response(2, 950))
+    assert ticks.tick_ms == pytest.approx(1000)
+    assert ticks.request_timeout_ms() == pytest.approx(1000)
+    assert not ticks.is_new_tick()
+    clock.now_ms += 1000
+    assert ticks.is_new_tick()
+
+
+def test_first_response_late_in_tick_keeps_usable_timeout(clock):
+    api = SimpleNamespace(rtt_ms=40, rtt_jitter_ms=0)
+    ticks = TickScheduler(api)
+    ticks.on_response(response(12, 12))
+    # остаток тика первого ответа — не длина тика
+    assert ticks.tick_ms == TICK_MS
+    assert ticks.request_timeout_ms() == TICK_MS
+    ticks = TickScheduler(api)
+    ticks.on_response(response(12, 0))
+    assert ticks.request_timeout_ms() == TICK_MS
+    # запрос дольше тика: таймаут всё равно дождётся ответа
+    api.rtt_ms = 2000
+    assert ticks.request_timeout_ms() == 2000 + TIMEOUT_MARGIN_MS
+
+
+def test_margin_follows_jitter_and_is_capped(clock):
+    api = SimpleNamespace(rtt_ms=100, rtt_jitter_ms=20)
+    ticks = TickScheduler(api, margin_ms=10, jitter_factor=3)
+    ticks.on_response(response(1, 1000))
+    assert ticks.send_margin_ms() == pytest.approx(60)
+    api.rtt_jitter_ms = 1000
+    assert ticks.send_margin_ms() == pytest.approx(250)
+
+
+def test_late_move_widens_margin(clock):
+    api = SimpleNamespace(rtt_ms=10, rtt_jitter_ms=0)
+    ticks = TickScheduler(api)
+    ticks.on_response(response(5, 1000))
+    clock.now_ms += 2000
+    asyncio.run(ticks.wait_send_time())
+    # ответ на ход уже с новым тиком: ход применится тиком позже
+    ticks.on_response(response(6, 990))
+    assert ticks.send_margin_ms() == pytest.approx(SEND_MARGIN_MS + LATE_STEP_MS)
+    clock.now_ms += 900
+    asyncio.run(ticks.wait_send_time())
+    ticks.on_response(response(6, 50))
+    assert SEND_MARGIN_MS < ticks.send_margin_ms() < SEND_MARGIN_MS + LATE_STEP_MS
+    # ответы, не связанные с ходом, запас не меняют
+    margin = ticks.send_margin_ms()
+    ticks.on_response(response(7, 990))
+    assert ticks.send_margin_ms() == margin
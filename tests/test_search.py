@@ -0,0 +1,114 @@
+import random
+import time
+
+import numpy as np
+import pytest
+
+from maps import assert_valid_path, distances, free_cells, synthetic_world
+from search import a_star, bidirectional_search
+from world import World
+
+
+def queries(world, count, seed=0):
+    """Случайные пары свободных клеток и эталонное расстояние между ними (None — недостижима)."""
+    random_source = random.Random(seed)
+    cells = free_cells(world)
+    for _ in range(count):
+        start, target = random_source.sample(cells, 2)
+        yield start, target, distances(world, start).get(world.encode(target))
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_a_star_paths_are_shortest_and_valid(seed):
+    world = synthetic_world(fence_density=0.3, seed=seed)
+    for start, target, distance in queries(world, 15, seed):
+        result = a_star(world, start, target)
+        assert result.found == (distance is not None)
+        if result.found:
+            assert len(result.path) - 1 == distance
+            assert_valid_path(world, result.path, start, target)
+        else:
+            assert result.exhausted
+
+
+def enclosed_world():
+    """Открытая карта, цель внутри закрытой коробки из заборов."""
+    world = World((20, 20, 10))
+    box = np.array([[x, y, z] for x in range(-2, 3) for y in range(-2, 3) for z in range(-2, 3)
+                    if max(abs(x), abs(y), abs(z)) == 2]) + [14, 14, 5]
+    world.add_cost(box, -100)
+    return world, [14, 14, 5]
+
+
+def test_a_star_blocked_target_is_reachable():
+    world = World((8, 8, 1))
+    world.add_cost(np.array([[5, 5, 0]]), -75)
+    result = a_star(world, [0, 0, 0], [5, 5, 0])
+    assert result.found and len(result.path) == 11
+
+
+def test_a_star_enclosed_target_is_exhausted():
+    world, target = enclosed_world()
+    result = a_star(world, [0, 0, 0], target)
+    assert not result.found and result.exhausted and result.path == []
+
+
+def test_a_star_partial_path_when_out_of_iterations():
+    world = World((40, 40, 10))
+    result = a_star(world, [0, 0, 0], [39, 39, 9], max_iterations=10)
+    assert not result.found and not result.exhausted
+    assert_valid_path(world, result.path, [0, 0, 0], result.path[-1])
+    assert len(result.path) > 1
+    result = a_star(world, [0, 0, 0], [39, 39, 9], deadline=time.perf_counter() - 1, check_every=1)
+    assert not result.found and len(result.path) >= 1
+
+
+def test_a_star_passes_body_that_will_be_vacated():
+    # тело поперёк коридора в одну клетку: в клетку тела входим на шаге 3, хвост должен уйти раньше
+    world = World((7, 1, 1))
+    body = world.add_cost(np.array([[3, 0, 0]]), -100)
+    world.set_vacate(body, [3])
+    assert a_star(world, [0, 0, 0], [6, 0, 0]).exhausted
+    world.set_vacate(body, [2])
+    result = a_star(world, [0, 0, 0], [6, 0, 0])
+    assert result.found and len(result.path) == 7
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_bidirectional_paths_match_a_star(seed):
+    world = synthetic_world(fence_density=0.3, seed=seed)
+    for start, target, distance in queries(world, 15, seed + 10):
+        result = bidirectional_search(world, start, target)
+        assert result.found == (distance is not None)
+        if result.found:
+            assert len(result.path) - 1 == distance == len(a_star(world, start, target).path) - 1
+            assert_valid_path(world, result.path, start, target)
+        else:
+            assert result.exhausted
+
+
+def test_bidirectional_enclosed_target_is_exhausted_quickly():
+    world, target = enclosed_world()
+    result = bidirectional_search(world, [0, 0, 0], target)
+    assert not result.found and result.exhausted
+    # обратный обход кончается внутри коробки
+    assert result.expansions < 100
+
+
+def test_bidirectional_deadline_gives_partial_path():
+    world = World((60, 60, 30))
+    began = time.perf_counter()
+    result = bidirectional_search(world, [0, 0, 0], [59, 59, 29], deadline=began + 0.01, chunk=64)
+    assert time.perf_counter() - began < 0.1
+    assert not result.found and not result.exhausted
+    assert_valid_path(world, result.path, [0, 0, 0], result.path[-1])
+
+
+def test_bidirectional_passes_body_that_will_be_vacated():
+    world = World((7, 1, 1))
+    body = world.add_cost(np.array([[3, 0, 0]]), -100)
+    world.set_vacate(body, [3])
+    assert bidirectional_search(world, [0, 0, 0], [6, 0, 0]).exhausted
+    world.set_vacate(body, [2])
+    result = bidirectional_search(world, [0, 0, 0], [6, 0, 0])
+    assert result.found and len(result.path) == 7
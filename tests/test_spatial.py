@@ -0,0 +1,49 @@
+import random
+
+from spatial import SpatialIndex
+
+
+def points(count, seed=0):
+    random_source = random.Random(seed)
+    return {(random_source.randrange(60), random_source.randrange(60), random_source.randrange(20)): i
+            for i in range(count)}
+
+
+def squared(a, b):
+    return sum((a[i] - b[i]) ** 2 for i in range(3))
+
+
+def test_within_radius_matches_brute_force():
+    items = points(300)
+    index = SpatialIndex()
+    for position, value in items.items():
+        index.insert(position, value)
+    for center in list(items)[:20] + [(30, 30, 10), (-5, 70, 3)]:
+        for radius in (0, 3, 10, 25):
+            found = {(cell, value, distance) for cell, value, distance in index.within_radius(center, radius)}
+            expected = {(cell, value, squared(cell, center)) for cell, value in items.items()
+                        if squared(cell, center) <= radius * radius}
+            assert found == expected
+
+
+def test_nearest_matches_brute_force():
+    items = points(200, seed=1)
+    index = SpatialIndex(bucket_size=4)
+    for position, value in items.items():
+        index.insert(position, value)
+    for center in [(0, 0, 0), (59, 59, 19), (30, 10, 5), (100, 100, 100)]:
+        for k in (1, 5, 30):
+            found = [distance for _, _, distance in index.nearest(center, k)]
+            assert found == sorted(squared(cell, center) for cell in items)[:k]
+
+
+def test_remove_and_update():
+    index = SpatialIndex()
+    index.insert((1, 2, 3), 10)
+    index.insert((1, 2, 3), 20)
+    index.insert((9, 9, 9), 5)
+    assert len(index) == 2 and index.get((1, 2, 3)) == 20
+    index.remove((1, 2, 3))
+    index.remove((1, 2, 3))
+    assert (1, 2, 3) not in index
+    assert [cell for cell, _, _ in index.nearest((0, 0, 0))] == [(9, 9, 9)]
@@ -0,0 +1,30 @@
+from state import GameState
+from world import World, UNREACHED
+
+
+def response(snakes=(), enemies=()):
+    return {
+        "mapSize": [12, 12, 4], "name": "test", "turn": 1, "fences": [[0, 0, 0]],
+        "snakes": [{"id": f"s{i}", "direction": [1, 0, 0], "geometry": geometry, "status": "alive"}
+                   for i, geometry in enumerate(snakes)],
+        "enemies": [{"geometry": geometry, "status": "alive"} for geometry in enemies],
+        "food": [], "specialFood": {"golden": [], "suspicious": []},
+    }
+
+
+def test_danger_field_counts_ticks_from_enemy_heads():
+    world = World.from_state(GameState.parse(response(enemies=[[[5, 5, 1], [5, 6, 1]]])))
+    assert world.reach[6, 6, 2] == 0
+    assert world.reach[7, 6, 2] == 1
+    assert world.reach[7, 7, 2] == 2
+    assert world.reach[8, 7, 2] == 3
+    assert world.reach[9, 7, 2] == UNREACHED
+
+
+def test_bodies_vacate_from_the_tail():
+    snake = [[2, 2, 1], [3, 2, 1], [4, 2, 1], [5, 2, 1]]
+    enemy = [[8, 8, 2], [8, 9, 2], [8, 10, 2]]
+    world = World.from_state(GameState.parse(response(snakes=[snake], enemies=[enemy])))
+    # сегмент j змеи длины L освобождается через L - j тиков; голова нашей змеи — не препятствие
+    assert [int(world.vacate_flat[world.encode(cell)]) for cell in snake] == [0, 3, 2, 1]
+    assert [int(world.vacate_flat[world.encode(cell)]) for cell in enemy] == [3, 2, 1]
@@ -0,0 +1,62 @@
+import random
+
+import numpy as np
+
+from local_server import GameServer, bot_moves
+from state import GameState
+from world import World
+from world_diff import WorldTracker
+
+
+def play(turns, seed=0):
+    """Ответы локального сервера нам на маленькой карте, где ходят три бота; еда съедается, змеи гибнут и растут."""
+    server = GameServer(map_size=(16, 16, 8), fence_count=60, food_count=30, snakes_per_player=3, seed=seed)
+    me = server.add_player("me")
+    bots = [server.add_player(f"bot{i}") for i in range(3)]
+    random_source = random.Random(seed)
+    fences = set(server.fences)
+    for _ in range(turns):
+        for bot in bots:
+            server.apply_moves(bot, bot_moves(server.state_for(bot), fences, random_source))
+        res = server.state_for(me)
+        server.apply_moves(me, bot_moves(res, fences, random_source))
+        yield GameState.parse(res)
+        server.tick()
+
+
+def assert_same_world(world, expected):
+    for name in ("cost", "value", "blocked", "reach", "vacate"):
+        assert np.array_equal(getattr(world, name), getattr(expected, name)), name
+    assert np.array_equal(world.fences, expected.fences)
+    assert world.food_index.items == expected.food_index.items
+    assert world.suspicious_index.items == expected.suspicious_index.items
+
+
+def test_tracker_matches_full_build():
+    tracker = WorldTracker()
+    for turn, state in enumerate(play(40)):
+        delta = tracker.update(state)
+        assert delta.full == (turn == 0)
+        assert_same_world(tracker.world, World.from_state(state))
+
+
+def test_delta_replica_matches_tracker():
+    # реплика в процессе-планировщике получает только изменения
+    tracker = WorldTracker()
+    replica = None
+    for state in play(25, seed=1):
+        delta = tracker.update(state)
+        if delta.full:
+            replica = World(delta.map_size, delta.horizon)
+        delta.apply(replica)
+        assert_same_world(replica, tracker.world)
+
+
+def test_same_turn_gives_empty_delta_and_rollback_rebuilds():
+    states = list(play(3, seed=2))
+    tracker = WorldTracker()
+    tracker.update(states[0])
+    tracker.update(states[1])
+    assert tracker.update(states[1]).is_empty()
+    assert tracker.update(states[0]).full
+    assert_same_world(tracker.world, World.from_state(states[0]))
@@ -0,0 +1,78 @@
+import multiprocessing
+import threading
+
+
+def visualizer_main(conn, fps, radius):
+    """
+    Цикл процесса визуализации. vpython импортируется только здесь.
+    Между кадрами вычитываются все пришедшие состояния, рисуется последнее.
+    """
+    from new_visualizer import SnakeGame3D
+    from vpython import rate
+
+    try:
+        message = conn.recv()
+        if message is None:
+            return
+        game = SnakeGame3D(message[0], fps, radius)
+        game.paths = message[1]
+        while True:
+            while conn.poll():
+                message = conn.recv()
+                if message is None:
+                    return
+                game.game_state, game.paths = message
+            game.visualize_all()
+            rate(fps)
+    except EOFError:
+        # основной процесс завершился
+        return
+
+
+class VisualizerProcess:
+    """
+    Визуализация в отдельном процессе, чтобы отрисовка не отнимала GIL у планирования.
+    Состояния передаются по принципу «последнее побеждает»: update только кладёт состояние в ячейку,
+    а поток-отправитель шлёт в процесс самое свежее, пропуская те, что не успели уйти.
+    """
+
+    def __init__(self, fps=10, radius=20):
+        context = multiprocessing.get_context("spawn")
+        receiver, self.conn = context.Pipe(duplex=False)
+        self.process = context.Process(target=visualizer_main, args=(receiver, fps, radius), daemon=True)
+        self.process.start()
+        receiver.close()
+        self.latest = None
+        self.running = True
+        self.ready = threading.Condition()
+        self.thread = threading.Thread(target=self.send_loop, daemon=True)
+        self.thread.start()
+
+    def update(self, game_state, paths):
+        """Отдаёт состояние на отрисовку и сразу возвращается."""
+        with self.ready:
+            self.latest = (game_state, paths)
+            self.ready.notify()
+
+    def send_loop(self):
+        while True:
+            with self.ready:
+                while self.latest is None and self.running:
+                    self.ready.wait()
+                message, self.latest = (self.latest, None) if self.running else (None, None)
+            try:
+                self.conn.send(message)
+            except OSError:
+                # окно визуализации закрыли — игра продолжается без неё
+                return
+            if message is None:
+                return
+
+    def close(self):
+        with self.ready:
+            self.running = False
+            self.ready.notify()
+        self.thread.join(timeout=1)
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.process.terminate()
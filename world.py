@@ -0,0 +1,285 @@
+import numpy as np
+
+from hpa import ChunkGraph
+from spatial import SpatialIndex
+
+FENCE_COST = -100
+BODY_COST = -100
+DANGER_COST = -75
+SUSPICIOUS_COST = -50
+
+# на сколько тиков вперёд считается, куда могут дойти головы врагов
+DANGER_HORIZON = 3
+# клетка дальше горизонта от всех голов
+UNREACHED = 255
+
+DIRECTIONS = [(1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)]
+DIRECTION_ARRAY = np.array(DIRECTIONS, dtype=np.int64)
+
+
+_empty_blocked = {}
+
+
+def empty_blocked(shape):
+    """Маска препятствий пустой карты: заблокирована только рамка. Кешируется по размеру."""
+    if shape not in _empty_blocked:
+        blocked = np.ones(shape, dtype=np.uint8)
+        blocked[1:-1, 1:-1, 1:-1] = 0
+        _empty_blocked[shape] = blocked
+    return _empty_blocked[shape]
+
+
+class World:
+    """
+    Плотная модель карты: стоимость и ценность каждой клетки в массивах numpy.
+    Массивы дополнены рамкой толщиной в одну клетку, которая всегда заблокирована,
+    поэтому соседей клетки на краю карты можно смотреть без проверки границ.
+    """
+
+    def __init__(self, map_size, horizon=DANGER_HORIZON, map_cache=None):
+        self.map_size = tuple(map_size)
+        self.shape = tuple(size + 2 for size in self.map_size)
+        # шаги по осям в плоском индексе
+        self.strides = (self.shape[1] * self.shape[2], self.shape[2], 1)
+        # отрицательная стоимость — препятствие (забор, тело, опасная зона); суммируется по слоям
+        self.cost = np.zeros(self.shape, dtype=np.int16)
+        # положительная ценность — еда
+        self.value = np.zeros(self.shape, dtype=np.int32)
+        # 1 — в клетку нельзя
+        self.border = empty_blocked(self.shape)
+        self.blocked = self.border.copy()
+        # плоские представления для поиска на чистом python: индексация memoryview дешевле, чем numpy
+        self.blocked_flat = memoryview(self.blocked.reshape(-1))
+        self.value_flat = memoryview(self.value.reshape(-1))
+        # сдвиги плоского индекса в порядке DIRECTIONS
+        self.neighbours = [sign * stride for stride in self.strides for sign in (1, -1)]
+        # пространственные индексы: еда и золотые кубы с ценой, подозрительные кубы
+        self.food_index = SpatialIndex()
+        self.suspicious_index = SpatialIndex()
+        # плоские индексы клеток, в которые писали при последней сборке
+        self.written = np.empty(0, dtype=np.int64)
+        # поле опасности: через сколько тиков до клетки может дойти голова врага (UNREACHED — не дальше horizon)
+        self.horizon = horizon
+        self.reach = np.full(self.shape, UNREACHED, dtype=np.uint8)
+        # рамка помечена как занятая с нулевого тика: обход поля не выходит за карту без отдельной проверки
+        self.reach[self.border == 1] = 0
+        self.reach_flat = memoryview(self.reach.reshape(-1))
+        self.reach_written = np.empty(0, dtype=np.int64)
+        # через сколько тиков клетка тела врага освободится, когда уйдёт хвост; 0 — не тело
+        self.vacate = np.zeros(self.shape, dtype=np.uint8)
+        self.vacate_flat = memoryview(self.vacate.reshape(-1))
+        self.vacate_written = np.empty(0, dtype=np.int64)
+        # плоские индексы заборов и построенный по ним граф блоков для иерархического поиска (создаётся по запросу)
+        self.fences = np.empty(0, dtype=np.int64)
+        self.chunks = None
+        # map_cache.MapCache — откуда загружать граф блоков, построенный в прошлых запусках
+        self.map_cache = map_cache
+
+    @staticmethod
+    def from_state(state):
+        """Строит мир по разобранному ответу сервера (GameState)."""
+        world = World(state.map_size)
+        world.build(state)
+        return world
+
+    def build(self, state):
+        """
+        Заполняет мир векторными записями по колоночному состоянию игры.
+        Массивы переиспользуются между тиками: затираются только клетки, записанные при прошлой сборке.
+        """
+        self.clear()
+        layers = [
+            (state.fences, FENCE_COST),
+            (state.enemy_segments, BODY_COST),
+            (state.own_bodies(), BODY_COST),
+            (state.suspicious, SUSPICIOUS_COST),
+        ]
+        coords = np.concatenate([layer for layer, _ in layers])
+        costs = np.repeat(
+            np.array([cost for _, cost in layers], dtype=self.cost.dtype), [len(layer) for layer, _ in layers]
+        )
+        cost_index = self.add_cost(coords, costs)
+        # голова может сдвинуться в любую сторону, учитываем
+        danger_index = self.neighbour_index(self.unique_index(state.enemy_heads()))
+        self.add_cost_at(danger_index, DANGER_COST)
+
+        target_index, target_values = self.food_layer(state)
+        self.set_value_at(target_index, target_values)
+        self.written = np.concatenate([cost_index, danger_index, target_index])
+        self.set_fences(self.unique_index(state.fences))
+        self.set_danger(self.unique_index(state.enemy_heads()))
+        self.set_vacate(*self.vacate_layer(state))
+
+        self.food_index.clear()
+        for position, value in zip(self.decode_many(target_index), target_values.tolist()):
+            self.food_index.insert(position, value)
+        self.suspicious_index.clear()
+        for position in map(tuple, state.suspicious.tolist()):
+            self.suspicious_index.insert(position, SUSPICIOUS_COST)
+
+    def food_layer(self, state):
+        """
+        Клетки с едой и их цена: отсортированные уникальные плоские индексы и цены.
+        Золотой куб стоит как самая дорогая еда, умноженная на 10, и перекрывает обычную еду в той же клетке.
+        """
+        food_index, food_inside = self.flat_index(state.food_coords)
+        golden_index, golden_inside = self.flat_index(state.golden)
+        index = np.concatenate([food_index[food_inside], golden_index[golden_inside]])
+        values = np.concatenate([
+            state.food_points[food_inside].astype(np.int64),
+            np.full(int(golden_inside.sum()), state.max_food_price() * 10, dtype=np.int64),
+        ])
+        # при повторе клетки побеждает последняя запись
+        index, first = np.unique(index[::-1], return_index=True)
+        values = values[::-1][first]
+        positive = values > 0
+        return index[positive], values[positive]
+
+    def vacate_layer(self, state):
+        """
+        Клетки тел змей (врагов и наших) и через сколько тиков каждая освободится: сегмент j змеи длины L
+        уходит через L - j тиков, если змея не вырастет. Голова нашей змеи не считается: из неё ищется путь.
+        Возвращает плоские индексы и число тиков.
+        """
+        lengths = np.diff(state.enemy_offsets)
+        position = np.arange(len(state.enemy_segments)) - np.repeat(state.enemy_offsets[:-1], lengths)
+        own = [snake.geometry for snake in state.snakes if snake.is_alive()]
+        segments = np.concatenate([state.enemy_segments] + [geometry[1:] for geometry in own])
+        ticks = np.concatenate(
+            [np.repeat(lengths, lengths) - position] + [len(geometry) - np.arange(1, len(geometry)) for geometry in own]
+        )
+        index, inside = self.flat_index(segments)
+        return index[inside], np.minimum(ticks[inside], UNREACHED - 1)
+
+    def set_fences(self, index):
+        """Запоминает заборы; граф блоков по старым заборам больше не годится."""
+        if not np.array_equal(index, self.fences):
+            self.fences = index
+            self.chunks = None
+
+    def chunk_graph(self):
+        """
+        Граф блоков карты по заборам (hpa.ChunkGraph); между ходами переиспользуется, пока заборы те же.
+        Если задан map_cache, граф сначала ищется на диске.
+        """
+        if self.chunks is None and self.map_cache is not None:
+            self.chunks = self.map_cache.load(self)
+        if self.chunks is None:
+            self.chunks = ChunkGraph(self, ChunkGraph.static_mask(self, self.fences))
+        return self.chunks
+
+    def set_vacate(self, index, ticks):
+        """Записывает время освобождения клеток тел; в клетке, где тела пересекаются, — наибольшее."""
+        vacate_flat = self.vacate.reshape(-1)
+        vacate_flat[self.vacate_written] = 0
+        np.maximum.at(vacate_flat, index, np.asarray(ticks, dtype=vacate_flat.dtype))
+        self.vacate_written = index
+
+    def set_danger(self, heads, horizon=None):
+        """
+        Пересчитывает поле опасности по плоским индексам голов врагов: horizon векторных шагов обхода в ширину
+        от всех голов сразу. Шаг обрабатывает только фронт прошлого шага, поэтому цена зависит от числа голов
+        и горизонта, а не от размера карты. Заборы и тела голову не останавливают — оценка с запасом.
+        """
+        if horizon is not None:
+            self.horizon = horizon
+        reach_flat = self.reach.reshape(-1)
+        reach_flat[self.reach_written] = UNREACHED
+        frontier = np.asarray(heads, dtype=np.int64)
+        reach_flat[frontier] = 0
+        written = [frontier]
+        steps = np.array(self.neighbours)
+        for step in range(1, self.horizon + 1):
+            if not len(frontier):
+                break
+            cells = (frontier[:, None] + steps).reshape(-1)
+            # сначала отбрасываем уже достигнутые клетки, потом убираем повторы сортировкой — она быстрее np.unique
+            cells = cells[reach_flat[cells] == UNREACHED]
+            cells.sort()
+            cells = cells[np.concatenate(([True], cells[1:] != cells[:-1]))]
+            reach_flat[cells] = step
+            written.append(cells)
+            frontier = cells
+        self.reach_written = np.concatenate(written)
+
+    def clear(self):
+        """Возвращает мир к пустой карте."""
+        self.cost.reshape(-1)[self.written] = 0
+        self.value.reshape(-1)[self.written] = 0
+        self.blocked.reshape(-1)[self.written] = 0
+        self.written = np.empty(0, dtype=np.int64)
+
+    def flat_index(self, coords):
+        """Плоские индексы клеток внутри карты; координаты за её пределами отбрасываются."""
+        inside = np.all((coords >= 0) & (coords < self.map_size), axis=1)
+        return (coords + 1) @ self.strides, inside
+
+    def unique_index(self, coords):
+        """Отсортированные уникальные плоские индексы клеток внутри карты."""
+        index, inside = self.flat_index(coords)
+        return np.unique(index[inside])
+
+    def neighbour_index(self, index):
+        """Плоские индексы шести соседей каждой клетки, без клеток рамки."""
+        neighbours = (index[:, None] + np.array(self.neighbours)).reshape(-1)
+        return neighbours[self.border.reshape(-1)[neighbours] == 0]
+
+    def add_cost(self, coords, cost):
+        """
+        Прибавляет стоимость к клеткам (повторы складываются) и обновляет маску препятствий.
+        Возвращает плоские индексы затронутых клеток.
+        """
+        index, inside = self.flat_index(coords)
+        index = index[inside]
+        self.add_cost_at(index, cost[inside] if np.ndim(cost) else cost)
+        return index
+
+    def add_cost_at(self, index, cost):
+        """Прибавляет стоимость к клеткам по плоским индексам."""
+        cost_flat = self.cost.reshape(-1)
+        # веса того же типа, что и массив, иначе add.at уходит в медленную ветку с приведением типов
+        np.add.at(cost_flat, index, np.asarray(cost, dtype=cost_flat.dtype))
+        self.blocked.reshape(-1)[index] = cost_flat[index] < 0
+
+    def set_value(self, coords, values):
+        """Записывает ценность в клетки. Возвращает плоские индексы затронутых клеток."""
+        index, inside = self.flat_index(coords)
+        index = index[inside]
+        self.set_value_at(index, values[inside] if np.ndim(values) else values)
+        return index
+
+    def set_value_at(self, index, values):
+        """Записывает ценность в клетки по плоским индексам."""
+        self.value.reshape(-1)[index] = values
+
+    def encode(self, position):
+        """Плоский индекс клетки."""
+        return (position[0] + 1) * self.strides[0] + (position[1] + 1) * self.strides[1] + position[2] + 1
+
+    def decode(self, index):
+        """Координаты клетки по плоскому индексу."""
+        x, rest = divmod(index, self.strides[0])
+        y, z = divmod(rest, self.strides[1])
+        return [x - 1, y - 1, z - 1]
+
+    def decode_many(self, index):
+        """Координаты клеток по массиву плоских индексов — список кортежей."""
+        x, rest = np.divmod(index, self.strides[0])
+        y, z = np.divmod(rest, self.strides[1])
+        return list(map(tuple, (np.stack([x, y, z], axis=1) - 1).tolist()))
+
+    def in_bounds(self, position):
+        """Проверяет, что позиция внутри границ карты."""
+        return all(0 <= position[i] < self.map_size[i] for i in range(3))
+
+    def is_blocked(self, position):
+        """Проверяет, что в клетку нельзя (препятствие или за пределами карты)."""
+        if not self.in_bounds(position):
+            return True
+        return bool(self.blocked[position[0] + 1, position[1] + 1, position[2] + 1])
+
+    def get_value(self, position):
+        """Ценность клетки, 0 если клетка пустая или за пределами карты."""
+        if not self.in_bounds(position):
+            return 0
+        return int(self.value[position[0] + 1, position[1] + 1, position[2] + 1])
@@ -0,0 +1,167 @@
+import numpy as np
+
+from world import World, FENCE_COST, BODY_COST, DANGER_COST, SUSPICIOUS_COST, DANGER_HORIZON
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+
+class WorldDelta:
+    """Изменения мира между двумя ответами сервера. Клетки — плоские индексы мира."""
+
+    def __init__(self, map_size, full=False, horizon=DANGER_HORIZON):
+        self.map_size = tuple(map_size)
+        self.full = full  # мир собран заново, а не дополнен
+        self.horizon = horizon
+        self.costs = []  # (индексы, прибавка к стоимости)
+        self.values = []  # (индексы, новая ценность)
+        self.index_updates = []  # (имя индекса мира, удаленные клетки, {добавленная клетка: значение})
+        # головы врагов и время освобождения клеток тел; меняются каждый ход и передаются целиком
+        self.heads = None
+        self.vacate = None
+        # все заборы, если они изменились
+        self.fences = None
+
+    def add_cost(self, index, cost):
+        if len(index):
+            self.costs.append((index, cost))
+
+    def set_value(self, index, values):
+        if len(index):
+            self.values.append((index, values))
+
+    def update_index(self, name, removed, inserted):
+        if removed or inserted:
+            self.index_updates.append((name, removed, inserted))
+
+    def set_danger(self, heads, vacate):
+        self.heads = heads
+        self.vacate = vacate
+
+    def set_fences(self, fences):
+        self.fences = fences
+
+    def is_empty(self):
+        return (not self.full and not self.costs and not self.values and not self.index_updates
+                and self.heads is None and self.fences is None)
+
+    def apply(self, world):
+        """Применяет изменения к миру. Для полной пересборки мир должен быть пустым."""
+        for index, cost in self.costs:
+            world.add_cost_at(index, cost)
+        for index, values in self.values:
+            world.set_value_at(index, values)
+        for name, removed, inserted in self.index_updates:
+            spatial_index = getattr(world, name)
+            for position in removed:
+                spatial_index.remove(position)
+            for position, value in inserted.items():
+                spatial_index.insert(position, value)
+        if self.fences is not None:
+            world.set_fences(self.fences)
+        if self.heads is not None:
+            world.set_danger(self.heads, self.horizon)
+            world.set_vacate(*self.vacate)
+
+
+class WorldTracker:
+    """
+    Постоянная модель мира, которая между ходами обновляется только изменившимися клетками.
+    Заборы, еда, спецеда и тела змей хранятся отсортированными массивами плоских индексов; новый ответ
+    сравнивается с прошлым векторными операциями над множествами, и в мир записывается разница.
+    При смене карты, названия раунда или откате хода мир собирается заново.
+    """
+
+    def __init__(self, horizon=DANGER_HORIZON, map_cache=None):
+        self.horizon = horizon  # на сколько тиков вперёд считается поле опасности
+        self.map_cache = map_cache  # map_cache.MapCache для графа блоков мира
+        self.world = None
+        self.name = None
+        self.turn = None
+        self.fences = None  # заборы из прошлого ответа, чтобы дешево понять, что они не менялись
+        self.layers = {}  # слой -> отсортированные уникальные индексы клеток
+        self.food = (EMPTY, EMPTY)  # индексы клеток с едой и их цены
+        self.last_delta = None
+
+    def needs_rebuild(self, state):
+        return (
+            self.world is None
+            or self.world.map_size != state.map_size
+            or self.name != state.name
+            or state.turn < self.turn
+        )
+
+    def update(self, state):
+        """Приводит мир к состоянию из ответа (GameState) и возвращает примененные изменения."""
+        if self.needs_rebuild(state):
+            self.world = World(state.map_size, self.horizon, self.map_cache)
+            self.name = state.name
+            self.fences = None
+            self.layers = {}
+            self.food = (EMPTY, EMPTY)
+            delta = WorldDelta(state.map_size, full=True, horizon=self.horizon)
+        elif state.turn == self.turn:
+            # тот же ход — ничего не изменилось
+            self.last_delta = WorldDelta(state.map_size, horizon=self.horizon)
+            return self.last_delta
+        else:
+            delta = WorldDelta(state.map_size, horizon=self.horizon)
+        self.turn = state.turn
+        world = self.world
+
+        # заборы не двигаются: сравнение массивов обычно сразу дает равенство
+        if self.fences is None or not np.array_equal(state.fences, self.fences):
+            fences = world.unique_index(state.fences)
+            self.diff_layer(delta, "fences", fences, FENCE_COST)
+            delta.set_fences(fences)
+            self.fences = state.fences
+
+        self.diff_layer(delta, "enemies", world.unique_index(state.enemy_segments), BODY_COST)
+        self.diff_layer(delta, "own", world.unique_index(state.own_bodies()), BODY_COST)
+        # голова может сдвинуться в любую сторону: опасные клетки вокруг каждой головы
+        # пересчитываются только для голов, которые сдвинулись
+        heads = world.unique_index(state.enemy_heads())
+        added, removed = self.diff_layer(delta, "heads", heads, 0)
+        delta.add_cost(world.neighbour_index(added), DANGER_COST)
+        delta.add_cost(world.neighbour_index(removed), -DANGER_COST)
+        # поле опасности на несколько тиков и хвосты, которые уйдут
+        delta.set_danger(heads, world.vacate_layer(state))
+        added, removed = self.diff_layer(delta, "suspicious", world.unique_index(state.suspicious), SUSPICIOUS_COST)
+        delta.update_index(
+            "suspicious_index", world.decode_many(removed), dict.fromkeys(world.decode_many(added), SUSPICIOUS_COST)
+        )
+
+        self.diff_food(delta, state)
+        delta.apply(world)
+        self.last_delta = delta
+        return delta
+
+    def diff_layer(self, delta, name, new, cost):
+        """Записывает в изменения разницу слоя и возвращает (добавленные, удаленные) клетки."""
+        old = self.layers.get(name, EMPTY)
+        added = np.setdiff1d(new, old, assume_unique=True)
+        removed = np.setdiff1d(old, new, assume_unique=True)
+        if cost:
+            delta.add_cost(added, cost)
+            delta.add_cost(removed, -cost)
+        self.layers[name] = new
+        return added, removed
+
+    def diff_food(self, delta, state):
+        world = self.world
+        index, values = world.food_layer(state)
+        old_index, old_values = self.food
+
+        removed = np.setdiff1d(old_index, index, assume_unique=True)
+        # клетки, которых не было, или с другой ценой
+        position = np.minimum(np.searchsorted(old_index, index), max(len(old_index) - 1, 0))
+        same = np.zeros(len(index), dtype=bool)
+        if len(old_index):
+            same = (old_index[position] == index) & (old_values[position] == values)
+        changed, changed_values = index[~same], values[~same]
+
+        delta.set_value(removed, 0)
+        delta.set_value(changed, changed_values)
+        delta.update_index(
+            "food_index", world.decode_many(removed), dict(zip(world.decode_many(changed), changed_values.tolist()))
+        )
+        self.food = (index, values)